@@ -0,0 +1,117 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import DEFERRED
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+
+# seconds since the epoch at which role/company claims were read from the DB
+CLAIMS_TIME_CLAIM = "claims_at"
+
+
+def get_auth_cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def membership_changed_key(user_id):
+    return f"membership:{user_id}:changed"
+
+
+# Tokens whose claims predate this are not trusted any more and the user is
+# loaded from the database instead, which also catches deactivated and
+# deleted users. Access tokens are short-lived, so the marker only has to
+# outlive them.
+def mark_membership_changed(*user_ids):
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()) + 60
+    get_auth_cache().set_many(
+        {membership_changed_key(user_id): time.time() for user_id in user_ids}, timeout
+    )
+
+
+def claims_are_current(token):
+    changed = get_auth_cache().get(membership_changed_key(token[api_settings.USER_ID_CLAIM]))
+    return changed is None or token[CLAIMS_TIME_CLAIM] > changed
+
+
+def token_user(user_id, **fields):
+    # a User with only the given fields (by attname) loaded; anything else is
+    # deferred and fetched from the database on first access
+    values = {field.attname: DEFERRED for field in User._meta.concrete_fields}
+    values.update(fields, id=user_id)
+    user = User(**values)
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+    return user
+
+
+class ClaimsRefreshToken(RefreshToken):
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_user_claims(user)
+        return token
+
+    def set_user_claims(self, user):
+        self["role"] = user.role
+        self["company_id"] = user.company_id
+        self["company_owner_id"] = user.company.owner_id if user.company_id else None
+        self[CLAIMS_TIME_CLAIM] = time.time()
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        # tokens issued before the claims existed, or whose company membership
+        # changed since, are served from the database as before
+        if CLAIMS_TIME_CLAIM not in validated_token or not claims_are_current(validated_token):
+            return super().get_user(validated_token)
+
+        user = token_user(
+            validated_token[api_settings.USER_ID_CLAIM],
+            role=validated_token["role"],
+            company_id=validated_token["company_id"],
+        )
+        user.company_owner_id = validated_token["company_owner_id"]
+        return user
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+
+        user = (
+            User.objects.select_related("company")
+            .filter(id=refresh[api_settings.USER_ID_CLAIM], is_active=True)
+            .first()
+        )
+        if user is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        refresh.set_user_claims(user)
+
+        data = {"access": str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+        return data
+
+
+def get_company_owner(user):
+    if user.role == "owner":
+        return user
+    # set by ClaimsJWTAuthentication, saves loading user.company.owner
+    company_owner_id = getattr(user, "company_owner_id", None)
+    if company_owner_id:
+        return token_user(company_owner_id, role="owner")
+    elif user.company and user.company.owner:
+        return user.company.owner
+    return user
@@ -0,0 +1,73 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def get_version(key):
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # a fresh version must never collide with one used before the key was
+        # evicted, so start from the clock instead of 1
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_versions(keys):
+    keys = set(keys)
+    if not keys:
+        return
+    _bump(keys)
+    # bump again after commit so a reader that rebuilt the cache from the
+    # pre-commit rows in between doesn't keep serving them
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def catalog_version_key(supplier_id):
+    return f"catalog:{supplier_id}:version"
+
+
+def get_catalog_version(supplier_id):
+    return get_version(catalog_version_key(supplier_id))
+
+
+def bump_catalog_version(*supplier_ids):
+    bump_versions(
+        catalog_version_key(supplier_id) for supplier_id in supplier_ids if supplier_id
+    )
+
+
+def cart_version_key(consumer_id):
+    return f"cart:{consumer_id}:version"
+
+
+def bump_cart_version(*consumer_ids):
+    bump_versions(cart_version_key(consumer_id) for consumer_id in consumer_ids if consumer_id)
+
+
+def get_cached_catalog(supplier_id, variant, build):
+    digest = hashlib.md5(variant.encode()).hexdigest()
+    key = f"catalog:{supplier_id}:v{get_catalog_version(supplier_id)}:{digest}"
+    cache = get_cache()
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+
+from .cache import cart_version_key, catalog_version_key, get_cache, get_version
+from .inventory import reserved_quantities
+from .models import CartItem
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def build_cart_summary(consumer_id):
+    lines = CartItem.objects.filter(consumer_id=consumer_id)
+    rows = (
+        lines.values("product__supplier_id", "product__supplier__full_name")
+        .annotate(
+            item_count=Count("id"),
+            units=Sum("quantity"),
+            subtotal=Sum(ExpressionWrapper(F("quantity") * F("product__effective_price"), output_field=MONEY)),
+            full_price=Sum(ExpressionWrapper(F("quantity") * F("product__price"), output_field=MONEY)),
+        )
+        .order_by("product__supplier__full_name", "product__supplier_id")
+    )
+
+    suppliers = [
+        {
+            "supplier_id": row["product__supplier_id"],
+            "supplier_name": row["product__supplier__full_name"],
+            "item_count": row["item_count"],
+            "units": row["units"],
+            "subtotal": row["subtotal"],
+            "savings": row["full_price"] - row["subtotal"],
+        }
+        for row in rows
+    ]
+
+    return {
+        "suppliers": suppliers,
+        "item_count": sum(supplier["item_count"] for supplier in suppliers),
+        "total": sum(supplier["subtotal"] for supplier in suppliers),
+        "savings": sum(supplier["savings"] for supplier in suppliers),
+    }
+
+
+# Lines that cannot be checked out as they are, by the same rule as
+# decrement_stock: stock minus other consumers' unexpired reservations.
+# Reservations do not bump any version, so this is never cached.
+def build_stock_warnings(consumer_id):
+    lines = list(
+        CartItem.objects.filter(consumer_id=consumer_id)
+        .values("product_id", "product__name", "quantity", "product__stock", "product__status")
+        .order_by("product_id")
+    )
+    if not lines:
+        return []
+    held = reserved_quantities([line["product_id"] for line in lines], consumer_id)
+    warnings = []
+    for line in lines:
+        available = 0
+        if line["product__status"] == "active":
+            available = max(line["product__stock"] - held.get(line["product_id"], 0), 0)
+        if line["quantity"] > available:
+            warnings.append(
+                {
+                    "product_id": line["product_id"],
+                    "product_name": line["product__name"],
+                    "quantity": line["quantity"],
+                    "available": available,
+                }
+            )
+    return warnings
+
+
+# Cached per consumer under the cart version; the entry also remembers the
+# catalog versions of the suppliers in the cart, so a price or stock change
+# to any of their products rebuilds it.
+def get_cart_totals(consumer_id):
+    cache = get_cache()
+    key = f"cart:{consumer_id}:v{get_version(cart_version_key(consumer_id))}:summary"
+    entry = cache.get(key)
+    if entry is not None:
+        catalog_keys = [catalog_version_key(supplier_id) for supplier_id in entry["catalog_versions"]]
+        current = cache.get_many(catalog_keys)
+        if all(
+            current.get(catalog_version_key(supplier_id)) == version
+            for supplier_id, version in entry["catalog_versions"].items()
+        ):
+            return entry["summary"]
+
+    # read the versions before the rows, so a concurrent write is never
+    # cached under the version that follows it
+    supplier_ids = set(
+        CartItem.objects.filter(consumer_id=consumer_id).values_list("product__supplier_id", flat=True)
+    )
+    catalog_versions = {
+        supplier_id: get_version(catalog_version_key(supplier_id)) for supplier_id in supplier_ids
+    }
+    summary = build_cart_summary(consumer_id)
+    cache.set(
+        key,
+        {"summary": summary, "catalog_versions": catalog_versions},
+        settings.CART_SUMMARY_CACHE_TIMEOUT,
+    )
+    return summary
+
+
+def get_cart_summary(consumer_id):
+    return {**get_cart_totals(consumer_id), "stock_warnings": build_stock_warnings(consumer_id)}
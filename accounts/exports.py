@@ -0,0 +1,107 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Order, OrderItem, Product
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+PRODUCT_EXPORT_FIELDS = [
+    "id", "sku", "name", "category", "price", "discount", "unit", "stock", "minOrder",
+    "status", "delivery_option", "lead_time_days", "image", "description", "created_at",
+]
+ORDER_EXPORT_FIELDS = [
+    "order_id", "created_at", "status", "consumer_id", "consumer_name", "total_price",
+    "item_id", "product_id", "product_name", "quantity", "price",
+]
+
+
+class Echo:
+    # csv.writer only needs something with write(); hand the line straight back
+    def write(self, value):
+        return value
+
+
+def to_csv(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([row.get(field) for field in header])
+
+
+def to_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def iter_products(supplier):
+    return (
+        Product.objects.filter(supplier=supplier)
+        .order_by("id")
+        .values(*PRODUCT_EXPORT_FIELDS)
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def iter_orders(supplier):
+    items = OrderItem.objects.select_related("product").only(
+        "id", "order_id", "product_id", "quantity", "price", "product__name"
+    ).order_by("id")
+    orders = (
+        Order.objects.filter(supplier=supplier)
+        .select_related("consumer")
+        .only("id", "created_at", "status", "total_price", "consumer__id", "consumer__full_name")
+        .prefetch_related(Prefetch("items", queryset=items))
+        .order_by("id")
+    )
+    # with chunk_size, iterator() streams from a server-side cursor and runs
+    # the items prefetch once per chunk
+    for order in orders.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield {
+            "order_id": order.id,
+            "created_at": order.created_at,
+            "status": order.status,
+            "consumer_id": order.consumer_id,
+            "consumer_name": order.consumer.full_name,
+            "total_price": order.total_price,
+            "items": [
+                {
+                    "item_id": item.id,
+                    "product_id": item.product_id,
+                    "product_name": item.product.name,
+                    "quantity": item.quantity,
+                    "price": item.price,
+                }
+                for item in order.items.all()
+            ],
+        }
+
+
+def order_item_rows(orders):
+    for order in orders:
+        items = order.pop("items")
+        if not items:
+            # keep orders without items in the export, item columns stay empty
+            yield order
+        for item in items:
+            yield {**order, **item}
+
+
+def export_products(supplier, file_format):
+    rows = iter_products(supplier)
+    if file_format == "csv":
+        return to_csv(PRODUCT_EXPORT_FIELDS, rows)
+    return to_ndjson(rows)
+
+
+def export_orders(supplier, file_format):
+    orders = iter_orders(supplier)
+    if file_format == "csv":
+        return to_csv(ORDER_EXPORT_FIELDS, order_item_rows(orders))
+    return to_ndjson(orders)
@@ -0,0 +1,187 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Product
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+# ?ordering= values and the unique keyset each of them paginates on
+CATALOG_ORDERINGS = {
+    "name": ("name", "id"),
+    "price": ("effective_price", "id"),
+    "-price": ("-effective_price", "-id"),
+}
+
+
+def split_values(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_price(params, name):
+    value = params.get(name)
+    if value in (None, ""):
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: ["Must be a number"]})
+    # NaN and Infinity parse but cannot be compared or stored
+    if not price.is_finite():
+        raise ValidationError({name: ["Must be a number"]})
+    return price
+
+
+def apply_catalog_filters(queryset, params):
+    if params.get("category"):
+        queryset = queryset.filter(category__in=split_values(params["category"]))
+    if params.get("delivery_option"):
+        queryset = queryset.filter(delivery_option__in=split_values(params["delivery_option"]))
+    if params.get("unit"):
+        queryset = queryset.filter(unit__in=split_values(params["unit"]))
+
+    min_price = parse_price(params, "min_price")
+    if min_price is not None:
+        queryset = queryset.filter(effective_price__gte=min_price)
+    max_price = parse_price(params, "max_price")
+    if max_price is not None:
+        queryset = queryset.filter(effective_price__lte=max_price)
+
+    if params.get("in_stock", "").lower() in TRUE_VALUES:
+        queryset = queryset.filter(stock__gt=0)
+    return queryset
+
+
+def catalog_ordering(params):
+    ordering = params.get("ordering") or "name"
+    if ordering not in CATALOG_ORDERINGS:
+        raise ValidationError({"ordering": [f"Must be one of: {', '.join(CATALOG_ORDERINGS)}"]})
+    return CATALOG_ORDERINGS[ordering]
+
+
+# The catalog params in canonical form (sorted lists, normalized numbers and
+# flags, known names only). The catalog cache key and pagination links are
+# built from these, so junk or reordered query strings share one entry.
+def catalog_cache_params(params):
+    normalized = {}
+    for name in ("category", "delivery_option", "unit"):
+        values = sorted(set(split_values(params.get(name, ""))))
+        if values:
+            normalized[name] = ",".join(values)
+    for name in ("min_price", "max_price"):
+        price = parse_price(params, name)
+        if price is not None:
+            normalized[name] = format(price.normalize(), "f")
+    for name in ("in_stock", "facets"):
+        if params.get(name, "").lower() in TRUE_VALUES:
+            normalized[name] = "true"
+    if params.get("ordering"):
+        catalog_ordering(params)
+        normalized["ordering"] = params["ordering"]
+
+    if "page_size" in params or "cursor" in params:
+        try:
+            page_size = int(params.get("page_size", ""))
+        except ValueError:
+            page_size = 0
+        if page_size <= 0:
+            page_size = settings.CATALOG_PAGE_SIZE
+        normalized["page_size"] = str(min(page_size, settings.CATALOG_MAX_PAGE_SIZE))
+    if params.get("cursor"):
+        normalized["cursor"] = params["cursor"]
+    return normalized
+
+
+# ?status= (comma list) and ?search= on the name of the other party
+def apply_link_filters(queryset, params, name_field):
+    if params.get("status"):
+        queryset = queryset.filter(status__in=split_values(params["status"]))
+    search = params.get("search", "").strip()
+    if search:
+        queryset = queryset.filter(**{f"{name_field}__icontains": search})
+    return queryset
+
+
+# (aware datetime, date_only) for an ISO date or datetime query parameter
+def parse_moment(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+        moment = datetime.combine(day, time.min) if day else parse_datetime(value)
+    except ValueError:
+        moment = day = None
+    if moment is None:
+        raise ValidationError({name: ["Must be a date (YYYY-MM-DD) or an ISO 8601 datetime"]})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, day is not None
+
+
+# ?from= / ?to= on a datetime field; a date-only ?to= includes the whole day
+def date_range_filter(params, field="created_at"):
+    condition = Q()
+    start = parse_moment(params, "from")
+    if start is not None:
+        condition &= Q(**{f"{field}__gte": start[0]})
+    end = parse_moment(params, "to")
+    if end is not None:
+        moment, date_only = end
+        if date_only:
+            condition &= Q(**{f"{field}__lt": moment + timedelta(days=1)})
+        else:
+            condition &= Q(**{f"{field}__lte": moment})
+    return condition
+
+
+def apply_order_filters(queryset, params):
+    if params.get("status"):
+        queryset = queryset.filter(status__in=split_values(params["status"]))
+    return queryset.filter(date_range_filter(params))
+
+
+def price_buckets():
+    bounds = settings.CATALOG_PRICE_BUCKETS
+    return [
+        (low, bounds[index + 1] if index + 1 < len(bounds) else None)
+        for index, low in enumerate(bounds)
+    ]
+
+
+# Every facet comes from one GROUP BY category query: delivery option and
+# price bucket counts are conditional aggregates summed over the groups.
+def catalog_facets(queryset):
+    aggregates = {}
+    for value, _ in Product.DELIVERY_CHOICES:
+        aggregates[f"delivery_{value}"] = Count("id", filter=Q(delivery_option=value))
+    for index, (low, high) in enumerate(price_buckets()):
+        condition = Q(effective_price__gte=low)
+        if high is not None:
+            condition &= Q(effective_price__lt=high)
+        aggregates[f"bucket_{index}"] = Count("id", filter=condition)
+
+    rows = list(
+        queryset.order_by()
+        .values("category")
+        .annotate(count=Count("id"), **aggregates)
+        .order_by("category")
+    )
+
+    return {
+        "total": sum(row["count"] for row in rows),
+        "categories": [{"value": row["category"], "count": row["count"]} for row in rows],
+        "delivery_options": [
+            {"value": value, "count": sum(row[f"delivery_{value}"] for row in rows)}
+            for value, _ in Product.DELIVERY_CHOICES
+        ],
+        "price_buckets": [
+            {"min": low, "max": high, "count": sum(row[f"bucket_{index}"] for row in rows)}
+            for index, (low, high) in enumerate(price_buckets())
+        ],
+    }
@@ -0,0 +1,124 @@
+import functools
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+def request_fingerprint(request):
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    if request.content_type.startswith("multipart/"):
+        # the raw body of an upload may be over DATA_UPLOAD_MAX_MEMORY_SIZE,
+        # so hash the parsed fields and the file names and sizes instead
+        for name in sorted(request.data):
+            for value in request.data.getlist(name):
+                if hasattr(value, "size"):
+                    value = f"{value.name}:{value.size}"
+                digest.update(f"{name}={value}\n".encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+# Returns (record, created). The record is None when the key was released
+# between the failed insert and the read, the caller just tries again.
+def claim_key(user, key, fingerprint):
+    now = timezone.now()
+    IdempotencyKey.objects.filter(user=user, key=key).filter(
+        Q(created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL))
+        | Q(
+            status="in_progress",
+            created_at__lt=now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+        )
+    ).delete()
+
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(user=user, key=key, fingerprint=fingerprint)
+        return record, True
+    except IntegrityError:
+        return IdempotencyKey.objects.filter(user=user, key=key).first(), False
+
+
+def replay(record):
+    response = HttpResponse(
+        bytes(record.response_body),
+        status=record.response_status,
+        content_type=record.response_content_type,
+    )
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+# Wraps an APIView handler so that requests repeating an Idempotency-Key get
+# the first response back instead of running again. Goes above
+# @transaction.atomic, the key has to be visible to other requests while the
+# handler runs.
+def idempotent(handler):
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"detail": "Idempotency-Key must be at most 255 characters"}, status=400
+            )
+
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record, created = claim_key(request.user, key, fingerprint)
+            if created:
+                break
+            if record is not None:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {"detail": "Idempotency-Key was already used for a different request"},
+                        status=422,
+                    )
+                if record.status == "completed":
+                    return replay(record)
+                if time.monotonic() >= deadline:
+                    return Response(
+                        {"detail": "A request with this Idempotency-Key is still in progress"},
+                        status=409,
+                    )
+                time.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+        try:
+            response = handler(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        # server errors are not stored, a retry gets to run again
+        if response.status_code >= 500:
+            record.delete()
+            return response
+
+        # render now, with the renderer content negotiation picked, so the
+        # replay is the exact bytes this client got; dispatch() finalizing
+        # the response again is harmless
+        response = self.finalize_response(request, response, *args, **kwargs)
+        response.render()
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            status="completed",
+            response_status=response.status_code,
+            response_body=response.content,
+            response_content_type=response["Content-Type"],
+        )
+        return response
+
+    return wrapper
@@ -0,0 +1,221 @@
+import io
+import ipaddress
+import logging
+import socket
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.request import (
+    HTTPDefaultErrorHandler,
+    HTTPErrorProcessor,
+    HTTPHandler,
+    HTTPRedirectHandler,
+    HTTPSHandler,
+    OpenerDirector,
+    Request,
+)
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import bump_catalog_version
+from .models import Product, ProductImageAttempt, ProductImageVariant
+
+logger = logging.getLogger(__name__)
+
+PIL_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+class ImageSourceError(Exception):
+    pass
+
+
+def image_source(product):
+    if product.image_file:
+        return product.image_file.name
+    return product.image or ""
+
+
+def variant_urls(product):
+    # {"thumb": {"webp": url, "jpeg": url}, ...}; expects image_variants to be
+    # prefetched when serializing lists
+    urls = {}
+    for variant in product.image_variants.all():
+        urls.setdefault(variant.name, {})[variant.format] = variant.file.url
+    return urls
+
+
+def check_public_address(address):
+    address = ipaddress.ip_address(address.split("%")[0])
+    if not address.is_global:
+        raise ImageSourceError(f"Refusing to fetch from non-public address {address}")
+
+
+# The peer address is checked after the connection is made, so hostnames that
+# resolve (or are rebound) to loopback, private or link-local addresses are
+# refused for the first request and for every redirect.
+def create_public_connection(address, *args, **kwargs):
+    sock = socket.create_connection(address, *args, **kwargs)
+    try:
+        check_public_address(sock.getpeername()[0])
+    except ImageSourceError:
+        sock.close()
+        raise
+    return sock
+
+
+class PublicHTTPConnection(HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = create_public_connection
+
+
+class PublicHTTPSConnection(HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = create_public_connection
+
+
+class PublicHTTPHandler(HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+# only http(s), no proxies from the environment, redirects go through the
+# same handlers
+def build_source_opener():
+    opener = OpenerDirector()
+    for handler in (
+        PublicHTTPHandler(),
+        PublicHTTPSHandler(),
+        HTTPRedirectHandler(),
+        HTTPDefaultErrorHandler(),
+        HTTPErrorProcessor(),
+    ):
+        opener.add_handler(handler)
+    return opener
+
+
+def read_source(product):
+    if product.image_file:
+        product.image_file.open("rb")
+        try:
+            return product.image_file.read(settings.IMAGE_MAX_SOURCE_BYTES + 1)
+        finally:
+            product.image_file.close()
+
+    if not product.image.startswith(("http://", "https://")):
+        raise ImageSourceError(f"Unsupported image URL {product.image!r}")
+    request = Request(product.image, headers={"User-Agent": "best-project-thumbnailer"})
+    try:
+        with build_source_opener().open(request, timeout=settings.IMAGE_FETCH_TIMEOUT) as response:
+            return response.read(settings.IMAGE_MAX_SOURCE_BYTES + 1)
+    except (OSError, ValueError) as exc:
+        raise ImageSourceError(f"Could not fetch {product.image}: {exc}")
+
+
+def render_variant(image, size, file_format):
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if file_format == "jpeg" or variant.mode not in ("RGB", "RGBA"):
+        variant = variant.convert("RGB")
+
+    buffer = io.BytesIO()
+    variant.save(
+        buffer,
+        PIL_FORMATS[file_format],
+        quality=settings.IMAGE_VARIANT_QUALITY,
+        optimize=True,
+    )
+    return buffer.getvalue(), variant.size
+
+
+def generate_variants(product_id):
+    product = Product.objects.filter(id=product_id).first()
+    if product is None:
+        return
+
+    source = image_source(product)
+    if not source:
+        # variant files are removed by the post_delete signal
+        product.image_variants.all().delete()
+        record_attempt(product, source, succeeded=True)
+        touch_product(product)
+        return
+
+    try:
+        data = read_source(product)
+        if len(data) > settings.IMAGE_MAX_SOURCE_BYTES:
+            raise ImageSourceError("Source image is too large")
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+        image.load()
+    except (ImageSourceError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning("Skipping image variants for product %s: %s", product_id, exc)
+        # saves that keep this source do not fetch it again;
+        # generate_image_variants --retry-failed does
+        record_attempt(product, source, succeeded=False)
+        return
+
+    created = []
+    for name, size in settings.IMAGE_VARIANTS.items():
+        for file_format in settings.IMAGE_VARIANT_FORMATS:
+            content, (width, height) = render_variant(image, size, file_format)
+            variant = ProductImageVariant(
+                product=product,
+                name=name,
+                format=file_format,
+                width=width,
+                height=height,
+                source=source,
+            )
+            variant.file.save(
+                f"{product.id}-{name}.{file_format}", ContentFile(content), save=False
+            )
+            created.append(variant)
+
+    with transaction.atomic():
+        product.image_variants.all().delete()
+        ProductImageVariant.objects.bulk_create(created)
+        record_attempt(product, source, succeeded=True)
+    touch_product(product)
+
+
+def record_attempt(product, source, succeeded):
+    ProductImageAttempt.objects.update_or_create(
+        product=product, defaults={"source": source, "succeeded": succeeded}
+    )
+
+
+def attempted_source(product_id):
+    return (
+        ProductImageAttempt.objects.filter(product_id=product_id).values_list("source", flat=True).first()
+        or ""
+    )
+
+
+# variant URLs are part of the product payload: invalidate cached catalogs and
+# let delta sync pick the product up again, without re-running save signals
+def touch_product(product):
+    Product.objects.filter(id=product.id).update(updated_at=timezone.now())
+    bump_catalog_version(product.supplier_id)
+
+
+# Fetching and resizing never runs in the request: without IMAGE_VARIANT_QUEUE
+# the product is left for "manage.py generate_image_variants", which picks up
+# every product whose image changed since its last attempt.
+def enqueue_variants(product_id):
+    if not settings.IMAGE_VARIANT_QUEUE:
+        return
+    import django_rq
+
+    django_rq.get_queue(settings.IMAGE_VARIANT_QUEUE).enqueue(generate_variants, product_id)
+
+
+def schedule_variants(product_id):
+    transaction.on_commit(lambda: enqueue_variants(product_id))
@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from .cache import bump_catalog_version
+from .images import schedule_variants
+from .models import Product
+from .search import index_products
+from .serializers import ProductImportSerializer
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+def detect_format(filename):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return None
+
+
+# yields (row number, row dict or None, parse error) without loading the file
+def iter_rows(upload, file_format):
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    number = 0
+    try:
+        if file_format == "csv":
+            for number, row in enumerate(csv.DictReader(stream), start=1):
+                # empty cells fall back to the model defaults
+                yield number, {key: value for key, value in row.items() if key and value not in ("", None)}, None
+            return
+
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "Each line must be a JSON object"
+                continue
+            yield number, row, None
+    except UnicodeDecodeError:
+        # decoding cannot resume after an invalid byte, so the rest of the file
+        # is reported as one failed row
+        yield number + 1, None, "File must be UTF-8 encoded; this row and the rest of the file were skipped"
+
+
+class ProductImporter:
+    def __init__(self, supplier, chunk_size=None):
+        self.supplier = supplier
+        self.chunk_size = chunk_size or settings.PRODUCT_IMPORT_CHUNK_SIZE
+        self.created = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        # building serializer fields is the expensive part of validation, so
+        # a single instance validates every row
+        self.serializer = ProductImportSerializer()
+
+    def add_error(self, number, errors):
+        self.failed += 1
+        if len(self.errors) < settings.PRODUCT_IMPORT_MAX_ERRORS:
+            self.errors.append({"row": number, "errors": errors})
+
+    def run(self, upload, file_format):
+        chunk = []
+        for number, row, error in iter_rows(upload, file_format):
+            if error:
+                self.add_error(number, {"non_field_errors": [error]})
+                continue
+            chunk.append((number, row))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+
+        if self.created or self.updated:
+            bump_catalog_version(self.supplier.id)
+        return self.report()
+
+    def flush(self, chunk):
+        rows = {}
+        for number, row in chunk:
+            try:
+                data = self.serializer.run_validation(row)
+            except serializers.ValidationError as exc:
+                self.add_error(number, serializers.as_serializer_error(exc))
+                continue
+            # a SKU repeated within the chunk: the last row wins
+            rows[data["sku"]] = data
+        if not rows:
+            return
+
+        try:
+            self.write(rows)
+        except IntegrityError:
+            # a concurrent import created some of these SKUs after the lookup;
+            # the retry sees them and updates them instead
+            self.write(rows)
+
+    def existing_products(self, skus):
+        return {
+            product.sku: product
+            for product in Product.objects.filter(supplier=self.supplier, sku__in=skus)
+        }
+
+    def write(self, rows):
+        with transaction.atomic():
+            existing = self.existing_products(list(rows))
+
+            to_create = []
+            to_update = []
+            update_fields = set()
+            image_changed = []
+            for sku, data in rows.items():
+                product = existing.get(sku)
+                if product is None:
+                    product = Product(supplier=self.supplier, **data)
+                    product.effective_price = product.discounted_price
+                    to_create.append(product)
+                    if product.image:
+                        image_changed.append(product)
+                    continue
+                if "image" in data and data["image"] != product.image and not product.image_file:
+                    image_changed.append(product)
+                for field, value in data.items():
+                    setattr(product, field, value)
+                product.effective_price = product.discounted_price
+                update_fields.update(data)
+                to_update.append(product)
+
+            Product.objects.bulk_create(to_create)
+            update_fields.discard("sku")
+            if update_fields & {"price", "discount"}:
+                update_fields.add("effective_price")
+            # bulk_update does not apply auto_now
+            now = timezone.now()
+            for product in to_update:
+                product.updated_at = now
+            update_fields.add("updated_at")
+            if to_update and update_fields:
+                Product.objects.bulk_update(to_update, sorted(update_fields))
+
+            # bulk writes skip post_save, so refresh the search index here
+            for product in to_update:
+                product.supplier = self.supplier
+            index_products(to_create + to_update)
+
+            # a no-op without IMAGE_VARIANT_QUEUE; generate_image_variants
+            # picks the changed images up then
+            for product in image_changed:
+                schedule_variants(product.id)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
+
+    def report(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def import_products(supplier, upload, file_format):
+    return ProductImporter(supplier).run(upload, file_format)
@@ -0,0 +1,254 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .cache import bump_cart_version, bump_catalog_version
+from .models import CartItem, OrderItem, Product, StockReservation, User
+
+
+class CartOperationError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product, available=None):
+        super().__init__(product.name if product else "stock changed concurrently")
+        self.product = product
+        self.available = available
+
+
+def quantity_case(quantities):
+    return Case(
+        *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(seconds=settings.CART_RESERVATION_TTL)
+
+
+# {product_id: quantity} held by unexpired reservations of everyone but
+# exclude_consumer_id, in one aggregate query
+def reserved_quantities(product_ids, exclude_consumer_id=None):
+    reservations = StockReservation.objects.filter(
+        product_id__in=product_ids, expires_at__gt=timezone.now()
+    )
+    if exclude_consumer_id is not None:
+        reservations = reservations.exclude(cart_item__consumer_id=exclude_consumer_id)
+    return dict(
+        reservations.values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+
+
+# Checkout and every cart write lock the consumer's row first, so they run one
+# at a time per consumer and always take their locks in the same order:
+# consumer, cart lines, products.
+def lock_consumer(consumer_id):
+    User.objects.select_for_update().values_list("id", flat=True).get(id=consumer_id)
+
+
+# Sets (or with add=True, increases) the consumer's cart line for product and
+# holds it for CART_RESERVATION_TTL. The product row is locked so two carts
+# cannot reserve the same units.
+def reserve_cart_item(consumer, product, quantity, add=False):
+    with transaction.atomic():
+        lock_consumer(consumer.id)
+        product = Product.objects.select_for_update().get(id=product.id)
+        item = CartItem.objects.filter(consumer=consumer, product=product).first()
+        if add and item is not None:
+            quantity += item.quantity
+
+        available = product.stock - reserved_quantities([product.id], consumer.id).get(product.id, 0)
+        if quantity > available:
+            raise InsufficientStock(product, max(available, 0))
+
+        if item is None:
+            item = CartItem.objects.create(consumer=consumer, product=product, quantity=quantity)
+        else:
+            item.quantity = quantity
+            item.save(update_fields=["quantity"])
+        StockReservation.objects.update_or_create(
+            cart_item=item,
+            defaults={"product": product, "quantity": quantity, "expires_at": reservation_expiry()},
+        )
+    return item
+
+
+# Applies set/add/remove operations to the consumer's cart in one
+# transaction: one locking query for the products, one aggregate for other
+# consumers' holds, then bulk writes. Nothing is written if any line fails
+# its minOrder or stock check; CartOperationError carries one error per line.
+def apply_cart_operations(consumer, operations, linked_supplier_ids):
+    product_ids = {operation["product_id"] for operation in operations}
+    with transaction.atomic():
+        lock_consumer(consumer.id)
+        products = {
+            product.id: product
+            for product in Product.objects.select_for_update().filter(id__in=product_ids).order_by("id")
+        }
+        items = {
+            item.product_id: item
+            for item in CartItem.objects.filter(consumer=consumer, product_id__in=product_ids)
+        }
+
+        quantities = {product_id: item.quantity for product_id, item in items.items()}
+        for operation in operations:
+            product_id = operation["product_id"]
+            if operation["op"] == "remove":
+                quantities[product_id] = 0
+            elif operation["op"] == "add":
+                quantities[product_id] = quantities.get(product_id, 0) + operation["quantity"]
+            else:
+                quantities[product_id] = operation["quantity"]
+
+        held = reserved_quantities(list(product_ids), consumer.id)
+        errors = []
+        # errors come back in the order the operations named the products
+        for product_id in dict.fromkeys(operation["product_id"] for operation in operations):
+            quantity = quantities[product_id]
+            item = items.get(product_id)
+            if quantity <= 0 or (item is not None and item.quantity == quantity):
+                continue
+            product = products.get(product_id)
+            if item is None and (product is None or product.status != "active"):
+                errors.append({"product_id": product_id, "detail": "Product not found"})
+            elif item is None and product.supplier_id not in linked_supplier_ids:
+                errors.append(
+                    {"product_id": product_id, "detail": "You must be linked with this supplier"}
+                )
+            elif quantity < product.minOrder:
+                errors.append(
+                    {
+                        "product_id": product_id,
+                        "detail": f"Minimum order is {product.minOrder} {product.unit}",
+                    }
+                )
+            elif quantity > product.stock - held.get(product_id, 0):
+                available = max(product.stock - held.get(product_id, 0), 0)
+                errors.append(
+                    {"product_id": product_id, "detail": f"Only {available} {product.unit} available"}
+                )
+        if errors:
+            raise CartOperationError(errors)
+
+        removed = [
+            item.id for product_id, item in items.items() if quantities[product_id] <= 0
+        ]
+        changed = []
+        for product_id, item in items.items():
+            if quantities[product_id] > 0 and quantities[product_id] != item.quantity:
+                item.quantity = quantities[product_id]
+                changed.append(item)
+        created = [
+            CartItem(consumer=consumer, product_id=product_id, quantity=quantity)
+            for product_id, quantity in quantities.items()
+            if product_id not in items and quantity > 0
+        ]
+
+        if removed:
+            CartItem.objects.filter(id__in=removed).delete()
+        if changed:
+            CartItem.objects.bulk_update(changed, ["quantity"])
+            StockReservation.objects.filter(cart_item__in=changed).delete()
+        if created:
+            CartItem.objects.bulk_create(created)
+        expires_at = reservation_expiry()
+        StockReservation.objects.bulk_create(
+            [
+                StockReservation(
+                    cart_item=item,
+                    product_id=item.product_id,
+                    quantity=item.quantity,
+                    expires_at=expires_at,
+                )
+                for item in changed + created
+            ]
+        )
+        # bulk_create/bulk_update skip post_save
+        bump_cart_version(consumer.id)
+
+
+# Takes {product_id: quantity} out of stock and returns the locked products
+# by id. Rows are locked in id order so concurrent checkouts over the same
+# products cannot deadlock, and the single UPDATE only touches rows that
+# still have enough stock, so the row count doubles as the final check.
+# Units reserved by other consumers are not available; the consumer's own
+# reservations are released with their cart lines.
+def decrement_stock(quantities, consumer_id=None):
+    with transaction.atomic():
+        products = {
+            product.id: product
+            for product in Product.objects.select_for_update().filter(id__in=quantities).order_by("id")
+        }
+        held = reserved_quantities(list(quantities), consumer_id)
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if product is None:
+                raise InsufficientStock(None)
+            available = product.stock - held.get(product_id, 0)
+            if available < quantity:
+                raise InsufficientStock(product, max(available, 0))
+
+        needed = quantity_case(quantities)
+        updated = (
+            Product.objects.filter(id__in=quantities)
+            .filter(Q(stock__gte=needed))
+            .update(stock=F("stock") - needed, updated_at=timezone.now())
+        )
+        if updated != len(quantities):
+            # only reachable without row locks; raising rolls the UPDATE back
+            raise InsufficientStock(None)
+
+    for product_id, quantity in quantities.items():
+        products[product_id].stock -= quantity
+    # queryset.update() skips post_save
+    bump_catalog_version(*{product.supplier_id for product in products.values()})
+    return products
+
+
+# Puts the items of the given orders back in stock: one aggregate sums the
+# quantities per product across all the orders, one UPDATE adds them with
+# F() so concurrent stock edits are not overwritten. Returns the quantities
+# by product id.
+def restock_orders(order_ids):
+    rows = list(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values("product_id", "product__supplier_id")
+        .annotate(total=Sum("quantity"))
+    )
+    quantities = {row["product_id"]: row["total"] for row in rows}
+    if not quantities:
+        return quantities
+
+    Product.objects.filter(id__in=quantities).update(
+        stock=F("stock") + quantity_case(quantities), updated_at=timezone.now()
+    )
+    # queryset.update() skips post_save
+    bump_catalog_version(*{row["product__supplier_id"] for row in rows})
+    return quantities
+
+
+# Deletes expired reservations in batches so the sweep never holds long
+# locks; expired rows are already ignored by the availability checks.
+def release_expired_reservations(batch_size=None):
+    batch_size = batch_size or settings.RESERVATION_SWEEP_BATCH_SIZE
+    released = 0
+    while True:
+        now = timezone.now()
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=now)
+            .order_by("expires_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return released
+        # skips holds that were renewed since they were selected
+        released += StockReservation.objects.filter(id__in=ids, expires_at__lte=now).delete()[0]
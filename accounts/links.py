@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+
+from .cache import bump_versions, get_cache, get_version
+from .models import LinkRequest
+
+
+# sent once per batch by set-based link updates, which bypass post_save;
+# kwargs: supplier_id, status, link_ids, consumer_ids
+link_statuses_changed = Signal()
+
+
+def link_version_key(consumer_id):
+    return f"links:{consumer_id}:version"
+
+
+def bump_link_version(*consumer_ids):
+    bump_versions(link_version_key(consumer_id) for consumer_id in consumer_ids if consumer_id)
+
+
+# Supplier ids a consumer is linked with: memoized on the request, then in the
+# shared cache under a per-consumer version bumped whenever one of the
+# consumer's links changes (see signals.py).
+def get_linked_supplier_ids(consumer_id, request=None):
+    memo = getattr(request, "_linked_supplier_ids", None) if request is not None else None
+    if memo is not None and consumer_id in memo:
+        return memo[consumer_id]
+
+    cache = get_cache()
+    key = f"links:{consumer_id}:v{get_version(link_version_key(consumer_id))}"
+    supplier_ids = cache.get(key)
+    if supplier_ids is None:
+        supplier_ids = list(
+            LinkRequest.objects.filter(consumer_id=consumer_id, status="linked")
+            .values_list("supplier_id", flat=True)
+        )
+        cache.set(key, supplier_ids, settings.LINK_CACHE_TIMEOUT)
+    supplier_ids = frozenset(supplier_ids)
+
+    if request is not None:
+        if memo is None:
+            memo = request._linked_supplier_ids = {}
+        memo[consumer_id] = supplier_ids
+    return supplier_ids
+
+
+def is_linked(consumer_id, supplier_id, request=None):
+    return supplier_id in get_linked_supplier_ids(consumer_id, request)
+
+
+# Moves the owner's links to `status` with one SELECT ... FOR UPDATE and one
+# UPDATE. Returns {link_id: outcome}, outcome being "updated", "unchanged",
+# "not_found" or "blocked" (blocked links cannot be accepted).
+def bulk_set_link_status(supplier_id, link_ids, status):
+    outcomes = {link_id: "not_found" for link_id in link_ids}
+    with transaction.atomic():
+        rows = (
+            LinkRequest.objects.select_for_update()
+            .filter(supplier_id=supplier_id, id__in=link_ids)
+            .values_list("id", "status", "consumer_id")
+        )
+        changed = {}
+        for link_id, current, consumer_id in rows:
+            if current == status:
+                outcomes[link_id] = "unchanged"
+            elif status == "linked" and current == "blocked":
+                outcomes[link_id] = "blocked"
+            else:
+                outcomes[link_id] = "updated"
+                changed[link_id] = consumer_id
+
+        if changed:
+            LinkRequest.objects.filter(supplier_id=supplier_id, id__in=list(changed)).update(status=status)
+            link_statuses_changed.send(
+                sender=LinkRequest,
+                supplier_id=supplier_id,
+                status=status,
+                link_ids=list(changed),
+                consumer_ids=sorted(set(changed.values())),
+            )
+    return outcomes
@@ -0,0 +1,126 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from accounts.management.seeding import raw_delete
+from accounts.models import Product, User
+from accounts.search import fuzzy_search_products, get_search_backend
+
+WORDS = [
+    "milk", "bread", "cheese", "butter", "apple", "banana", "sugar", "flour",
+    "rice", "coffee", "tea", "juice", "yogurt", "honey", "salt", "pepper",
+    "chicken", "beef", "fish", "pasta", "tomato", "potato", "onion", "garlic",
+]
+CATEGORIES = ["Dairy", "Bakery", "Fruits", "Vegetables", "Meat", "Grocery", "Drinks"]
+SYLLABLES = ["ka", "lo", "mi", "ra", "su", "te", "no", "vi", "za", "po", "re", "du"]
+
+
+class Command(BaseCommand):
+    help = "Compare the search backend against the old icontains scan and time fuzzy search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1_000_000)
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--queries", nargs="+", default=["milk", "kalomi bread", "kalo"])
+        parser.add_argument("--fuzzy-queries", nargs="+", default=["mlik", "kalomy", "bred"])
+        parser.add_argument("--keep", action="store_true", help="Keep the generated data")
+
+    def handle(self, *args, **options):
+        supplier = User.objects.create_user(
+            email=f"bench-{time.time_ns()}@bench.local",
+            password=None,
+            full_name="Benchmark Supplier",
+            role="owner",
+        )
+        try:
+            self.seed(supplier, options["products"], options["batch_size"])
+            self.run(supplier, options)
+        finally:
+            if not options["keep"]:
+                # no per-product post_delete work (tombstones, search, cache)
+                raw_delete(Product.objects.filter(supplier=supplier))
+                supplier.delete()
+
+    def seed(self, supplier, total, batch_size):
+        backend = get_search_backend()
+        rng = random.Random(42)
+        # a few thousand made-up brand words plus the real product words, so
+        # that term frequencies look more like a real catalog
+        brands = sorted({"".join(rng.choices(SYLLABLES, k=3)) for _ in range(5000)})
+        vocabulary = WORDS + brands
+        started = time.perf_counter()
+        created = 0
+        while created < total:
+            size = min(batch_size, total - created)
+            prices = [rng.randint(10, 5000) for _ in range(size)]
+            batch = [
+                Product(
+                    supplier=supplier,
+                    name=f"{rng.choice(brands)} {rng.choice(WORDS)}".title(),
+                    category=rng.choice(CATEGORIES),
+                    description=" ".join(rng.choices(vocabulary, k=12)),
+                    price=price,
+                    effective_price=price,
+                    stock=rng.randint(0, 500),
+                )
+                for price in prices
+            ]
+            Product.objects.bulk_create(batch)
+            backend.index(batch)
+            created += size
+
+        # refresh planner statistics so the indexes are actually used
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            f"Seeded {total} products in {time.perf_counter() - started:.1f}s"
+        )
+
+    def run(self, supplier, options):
+        backend = get_search_backend()
+        supplier_ids = [supplier.id]
+        limit = options["limit"]
+
+        for query in options["queries"]:
+            icontains = self.measure(
+                lambda: list(
+                    Product.objects.filter(supplier_id__in=supplier_ids)
+                    .filter(Q(name__icontains=query) | Q(description__icontains=query))
+                    .values_list("id", flat=True)
+                ),
+                options["runs"],
+            )
+            indexed = self.measure(
+                lambda: backend.search(query, supplier_ids, limit),
+                options["runs"],
+            )
+            self.stdout.write(
+                f"{query!r:>16}  icontains median {icontains * 1000:9.1f} ms  "
+                f"{type(backend).__name__} median {indexed * 1000:9.1f} ms"
+            )
+
+        budget = settings.SEARCH_FUZZY_TIMEOUT_MS
+        for query in options["fuzzy_queries"]:
+            fuzzy = self.measure(
+                lambda: fuzzy_search_products(query, supplier_ids, limit),
+                options["runs"],
+            )
+            verdict = "ok" if fuzzy * 1000 <= budget else "OVER BUDGET"
+            self.stdout.write(
+                f"{query!r:>16}  fuzzy median {fuzzy * 1000:9.1f} ms  (budget {budget} ms, {verdict})"
+            )
+
+    def measure(self, func, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
@@ -0,0 +1,190 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from accounts.management.seeding import raw_delete
+from accounts.models import (
+    CartItem,
+    ChatRoom,
+    Complaint,
+    LinkRequest,
+    Message,
+    Order,
+    Product,
+    User,
+)
+
+SEED_DOMAIN = "explain.local"
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on (\w+)"),
+    # "SCAN table" without "USING INDEX" is a full table scan in SQLite
+    "sqlite": re.compile(r"\bSCAN (\w+)\s*$", re.MULTILINE),
+}
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot-path queries and fail if any of them falls back to a sequential scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Generate this many orders (and a proportional amount of other rows) first",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--keep", action="store_true", help="Keep the generated data")
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan")
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"EXPLAIN checks are not supported on {connection.vendor}")
+
+        try:
+            if options["seed"]:
+                self.seed(options["seed"], options["batch_size"])
+            self.check_queries(pattern, options["verbose_plans"])
+        finally:
+            if options["seed"] and not options["keep"]:
+                self.delete_seeded()
+
+    def delete_seeded(self):
+        users = User.objects.filter(email__endswith=f"@{SEED_DOMAIN}")
+        # products and links have per-row post_delete handlers (tombstones,
+        # search, cache versions), so they go without signals; the rest of the
+        # seed cascades from the users in bulk
+        raw_delete(Product.objects.filter(supplier__in=users))
+        raw_delete(LinkRequest.objects.filter(supplier__in=users))
+        users.delete()
+
+    def canonical_queries(self):
+        link = LinkRequest.objects.filter(status="linked").first()
+        room = ChatRoom.objects.first()
+        if link is None or room is None:
+            raise CommandError("Nothing to explain, run with --seed N")
+        supplier_id, consumer_id = link.supplier_id, link.consumer_id
+
+        return {
+            "link check": LinkRequest.objects.filter(
+                supplier_id=supplier_id, consumer_id=consumer_id, status="linked"
+            ),
+            "linked suppliers": LinkRequest.objects.filter(consumer_id=consumer_id, status="linked"),
+            "supplier links": LinkRequest.objects.filter(
+                supplier_id=supplier_id, status="linked"
+            ).order_by("-created_at"),
+            "catalog": Product.objects.filter(
+                supplier_id=supplier_id, status="active"
+            ).order_by("name", "id"),
+            "catalog by price": Product.objects.filter(
+                supplier_id=supplier_id, status="active"
+            ).order_by("effective_price", "id"),
+            "cart": CartItem.objects.filter(consumer_id=consumer_id),
+            "consumer orders": Order.objects.filter(consumer_id=consumer_id).order_by("-created_at"),
+            "consumer stats": Order.objects.filter(consumer_id=consumer_id, status="delivered"),
+            "supplier orders": Order.objects.filter(supplier_id=supplier_id).order_by("-created_at"),
+            "supplier active orders": Order.objects.filter(
+                supplier_id=supplier_id, status__in=["pending", "approved"]
+            ).order_by("-created_at"),
+            "chat messages": Message.objects.filter(room_id=room.id).order_by("timestamp"),
+            "supplier complaints": Complaint.objects.filter(
+                supplier_id=supplier_id, status="escalated"
+            ).order_by("-created_at"),
+            "consumer complaints": Complaint.objects.filter(consumer_id=consumer_id).order_by("-created_at"),
+        }
+
+    def check_queries(self, pattern, verbose):
+        failures = []
+        for label, queryset in self.canonical_queries().items():
+            plan = queryset.explain()
+            scans = pattern.findall(plan)
+            verdict = f"SEQ SCAN on {', '.join(scans)}" if scans else "ok"
+            self.stdout.write(f"{label:>24}  {verdict}")
+            if verbose or scans:
+                self.stdout.write(plan)
+            if scans:
+                failures.append(label)
+
+        if failures:
+            raise CommandError(f"Sequential scans in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All queries use an index"))
+
+    def seed(self, total, batch_size):
+        rng = random.Random(42)
+        started = time.perf_counter()
+        stamp = time.time_ns()
+
+        def create(model, objects):
+            return model.objects.bulk_create(objects, batch_size=batch_size)
+
+        owners = create(User, [
+            User(email=f"owner-{stamp}-{i}@{SEED_DOMAIN}", full_name=f"Owner {i}", role="owner", password="!")
+            for i in range(max(total // 5000, 20))
+        ])
+        consumers = create(User, [
+            User(email=f"consumer-{stamp}-{i}@{SEED_DOMAIN}", full_name=f"Consumer {i}", role="consumer", password="!")
+            for i in range(max(total // 100, 200))
+        ])
+
+        # every consumer knows a handful of suppliers
+        pairs = {
+            (owner.id, consumer.id)
+            for consumer in consumers
+            for owner in rng.sample(owners, min(5, len(owners)))
+        }
+        statuses = ["linked"] * 6 + ["pending", "rejected", "blocked"]
+        create(LinkRequest, [
+            LinkRequest(supplier_id=s, consumer_id=c, status=rng.choice(statuses))
+            for s, c in pairs
+        ])
+        rooms = create(ChatRoom, [ChatRoom(supplier_id=s, consumer_id=c) for s, c in pairs])
+
+        products = create(Product, [
+            Product(
+                supplier=rng.choice(owners),
+                name=f"Product {i}",
+                price=price,
+                effective_price=price,
+                stock=rng.randint(0, 500),
+                status=rng.choice(["active", "active", "active", "inactive"]),
+            )
+            for i, price in enumerate(rng.randint(10, 5000) for _ in range(total))
+        ])
+
+        orders = create(Order, [
+            Order(
+                supplier_id=s,
+                consumer_id=c,
+                total_price=rng.randint(100, 50000),
+                status=rng.choice(["pending", "approved", "delivered", "delivered", "cancelled"]),
+            )
+            for s, c in (rng.choice(list(pairs)) for _ in range(total))
+        ])
+        create(Message, [
+            Message(room=room, sender_id=room.consumer_id, text="hello")
+            for room in (rng.choice(rooms) for _ in range(total))
+        ])
+        create(Complaint, [
+            Complaint(
+                order=order,
+                supplier_id=order.supplier_id,
+                consumer_id=order.consumer_id,
+                title="Late delivery",
+                description="-",
+                status=rng.choice(["pending", "resolved", "rejected", "escalated"]),
+            )
+            for order in rng.sample(orders, len(orders) // 10)
+        ])
+        create(CartItem, [
+            CartItem(consumer=consumer, product=product, quantity=1)
+            for consumer in consumers
+            for product in rng.sample(products, min(3, len(products)))
+        ])
+
+        # refresh planner statistics so the new indexes are considered
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(f"Seeded {total} orders in {time.perf_counter() - started:.1f}s")
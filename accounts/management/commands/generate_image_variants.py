@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Case, CharField, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from accounts.images import enqueue_variants, generate_variants
+from accounts.models import Product, ProductImageAttempt
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate image variants for products whose image changed since the last attempt, "
+        "on the IMAGE_VARIANT_QUEUE worker if set, otherwise in this process"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate variants for every product")
+        parser.add_argument(
+            "--retry-failed", action="store_true", help="Also retry sources whose last attempt failed"
+        )
+
+    def handle(self, *args, **options):
+        if options["all"]:
+            products = Product.objects.filter(Q(image_file__gt="") | Q(image__gt=""))
+        else:
+            attempts = ProductImageAttempt.objects.filter(product=OuterRef("pk"))
+            # same rule as image_source(): the uploaded file wins over the URL
+            products = Product.objects.annotate(
+                current_source=Case(
+                    When(image_file__gt="", then=F("image_file")),
+                    default=Coalesce("image", Value("")),
+                    output_field=CharField(),
+                ),
+                attempted_source=Coalesce(Subquery(attempts.values("source")), Value("")),
+                attempt_failed=Subquery(attempts.filter(succeeded=False).values("succeeded")),
+            )
+            pending = ~Q(current_source=F("attempted_source"))
+            if options["retry_failed"]:
+                pending |= Q(attempt_failed__isnull=False)
+            products = products.filter(pending)
+
+        run = enqueue_variants if settings.IMAGE_VARIANT_QUEUE else generate_variants
+        count = 0
+        for product_id in products.values_list("id", flat=True).iterator():
+            run(product_id)
+            count += 1
+        self.stdout.write(f"Processed image variants for {count} products")
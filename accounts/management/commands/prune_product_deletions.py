@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.models import ProductDeletion
+
+
+class Command(BaseCommand):
+    help = "Delete catalog sync tombstones older than CATALOG_SYNC_RETENTION_DAYS"
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.CATALOG_SYNC_RETENTION_DAYS)
+        deleted, _ = ProductDeletion.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(f"Deleted {deleted} tombstones")
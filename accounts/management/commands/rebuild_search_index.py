@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Product
+from accounts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options["batch_size"]
+
+        batch = []
+        indexed = 0
+        products = Product.objects.select_related("supplier").order_by("id")
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                backend.index(batch)
+                indexed += len(batch)
+                batch = []
+        if batch:
+            backend.index(batch)
+            indexed += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {indexed} products with {type(backend).__name__}")
+        )
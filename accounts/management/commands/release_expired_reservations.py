@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Delete cart stock reservations that are past their CART_RESERVATION_TTL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.RESERVATION_SWEEP_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(options["batch_size"])
+        self.stdout.write(f"Released {released} reservations")
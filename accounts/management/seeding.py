@@ -0,0 +1,20 @@
+from django.db import models
+
+
+# Deletes the rows of queryset, and before them every row that references
+# them, with plain DELETE statements: nothing is loaded and no delete signals
+# are sent. Only for data a management command generated itself, where the
+# per-row post_delete work (sync tombstones, search and cache invalidation)
+# would be one or more queries per generated row for nothing.
+def raw_delete(queryset):
+    for relation in queryset.model._meta.related_objects:
+        if relation.many_to_many:
+            continue
+        related = relation.related_model._base_manager.filter(
+            **{f"{relation.field.name}__in": queryset.values("pk")}
+        )
+        if relation.on_delete is models.SET_NULL:
+            related.update(**{relation.field.name: None})
+        else:
+            raw_delete(related)
+    queryset._raw_delete(queryset.db)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0012_product_delivery_option_product_discount_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["supplier", "status", "name", "id"], name="product_catalog_idx"
+            ),
+        ),
+    ]
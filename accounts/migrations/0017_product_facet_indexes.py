@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0016_product_sku"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["supplier", "status", "category"], name="product_category_idx"
+            ),
+        ),
+    ]
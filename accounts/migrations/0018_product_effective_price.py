@@ -0,0 +1,47 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:52
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Round
+
+
+def backfill_effective_price(apps, schema_editor):
+    Product = apps.get_model("accounts", "Product")
+    output = models.DecimalField(max_digits=10, decimal_places=2)
+    hundred = Value(Decimal("100"), output_field=output)
+    Product.objects.update(
+        effective_price=Round(
+            F("price") * (hundred - F("discount")) / hundred, 2, output_field=output
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0017_product_facet_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="effective_price",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                editable=False,
+                help_text="Price after discount, kept in sync on save and in bulk updates",
+                max_digits=10,
+            ),
+        ),
+        migrations.RunPython(backfill_effective_price, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["supplier", "status", "effective_price", "id"],
+                name="product_effective_price_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0018_product_effective_price"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="complaint",
+            index=models.Index(
+                fields=["supplier", "status", "created_at"],
+                name="complaint_supplier_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="complaint",
+            index=models.Index(
+                fields=["supplier", "created_at"], name="complaint_supplier_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="complaint",
+            index=models.Index(
+                fields=["consumer", "created_at"], name="complaint_consumer_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="linkrequest",
+            index=models.Index(
+                fields=["consumer", "status"], name="link_consumer_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="linkrequest",
+            index=models.Index(
+                fields=["supplier", "status", "created_at"],
+                name="link_supplier_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["room", "timestamp"], name="message_room_timestamp_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["supplier", "status", "created_at"],
+                name="order_supplier_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["supplier", "created_at"], name="order_supplier_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["consumer", "status"], name="order_consumer_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["consumer", "created_at"], name="order_consumer_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status__in", ["pending", "approved"])),
+                fields=["supplier", "created_at"],
+                name="order_supplier_open_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0019_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="image_file",
+            field=models.ImageField(
+                blank=True, null=True, upload_to="products/originals/"
+            ),
+        ),
+        migrations.CreateModel(
+            name="ProductImageVariant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=20)),
+                ("format", models.CharField(max_length=10)),
+                ("file", models.FileField(upload_to="products/variants/")),
+                ("width", models.PositiveIntegerField()),
+                ("height", models.PositiveIntegerField()),
+                ("source", models.CharField(max_length=500)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="image_variants",
+                        to="accounts.product",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("product", "name", "format")},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.17 on 2026-10-17 12:59
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    Product = apps.get_model("accounts", "Product")
+    Product.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0020_product_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductDeletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("product_id", models.BigIntegerField()),
+                ("supplier_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["supplier", "updated_at"], name="product_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productdeletion",
+            index=models.Index(
+                fields=["supplier_id", "deleted_at"], name="product_deletion_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.17 on 2026-10-17 14:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_image_attempts(apps, schema_editor):
+    ProductImageAttempt = apps.get_model("accounts", "ProductImageAttempt")
+    ProductImageVariant = apps.get_model("accounts", "ProductImageVariant")
+    sources = dict(ProductImageVariant.objects.values_list("product_id", "source"))
+    ProductImageAttempt.objects.bulk_create(
+        [
+            ProductImageAttempt(product_id=product_id, source=source, succeeded=True)
+            for product_id, source in sources.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0023_stock_reservations"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductImageAttempt",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="image_attempt",
+                        serialize=False,
+                        to="accounts.product",
+                    ),
+                ),
+                ("source", models.CharField(blank=True, max_length=500)),
+                ("succeeded", models.BooleanField(default=False)),
+                ("attempted_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_image_attempts, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
+from decimal import ROUND_HALF_UP, Decimal
+
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Round
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import BaseUserManager
 
@@ -91,30 +97,213 @@ class Product(models.Model):
     ]
 
     supplier = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='products')
+    sku = models.CharField(max_length=64, blank=True, null=True, help_text="Supplier-scoped stock keeping unit")
     name = models.CharField(max_length=120)
     category = models.CharField(max_length=100, default='Uncategorized')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     discount = models.DecimalField(max_digits=5, decimal_places=2, default=0, help_text="Discount percentage (0-100)")
+    effective_price = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text="Price after discount, kept in sync on save and in bulk updates",
+    )
     unit = models.CharField(max_length=10, choices=UNIT_CHOICES, default='kg')
     stock = models.PositiveIntegerField(default=0)
     minOrder = models.PositiveIntegerField(default=1)
     image = models.URLField(blank=True, null=True)
+    image_file = models.ImageField(upload_to="products/originals/", blank=True, null=True)
     description = models.TextField(blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
     delivery_option = models.CharField(max_length=10, choices=DELIVERY_CHOICES, default='both')
     lead_time_days = models.PositiveIntegerField(default=0, help_text="Number of days for order fulfillment")
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # bulk writes (queryset.update / bulk_update) must set this explicitly
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["supplier", "status", "name", "id"], name="product_catalog_idx"),
+            models.Index(fields=["supplier", "updated_at"], name="product_updated_idx"),
+            models.Index(fields=["supplier", "status", "category"], name="product_category_idx"),
+            models.Index(
+                fields=["supplier", "status", "effective_price", "id"],
+                name="product_effective_price_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["supplier", "sku"], name="product_supplier_sku_uniq"),
+        ]
+
+    # fields with side effects in signals.py (search document, image
+    # variants); their values as loaded let a save skip work they don't need
+    TRACKED_FIELDS = ("supplier", "name", "category", "description", "image", "image_file")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance.tracked_values()
+        return instance
+
+    def tracked_values(self, fields=TRACKED_FIELDS):
+        deferred = self.get_deferred_fields()
+        values = {}
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            if attname not in deferred:
+                value = getattr(self, attname)
+                # file fields compare by stored name
+                values[name] = value.name if isinstance(value, FieldFile) else value
+        return values
+
+    def written_fields(self, fields, update_fields):
+        if update_fields is None:
+            return list(fields)
+        return [name for name in fields if {name, self._meta.get_field(name).attname} & set(update_fields)]
+
+    # whether a save (limited to update_fields) writes a value of fields that
+    # may differ from the stored row; unknown (new or deferred) counts as changed
+    def has_changed(self, *fields, update_fields=None):
+        fields = self.written_fields(fields, update_fields)
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return bool(fields)
+        current = self.tracked_values(fields)
+        return any(name not in loaded or current.get(name) != loaded[name] for name in fields)
+
+    @staticmethod
+    def calculate_effective_price(price, discount):
+        price = Decimal(str(price))
+        discount = Decimal(str(discount or 0))
+        return (price * (100 - discount) / 100).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
     @property
     def discounted_price(self):
-        if self.discount > 0:
-            return self.price * (1 - self.discount / 100)
-        return self.price
+        return self.calculate_effective_price(self.price, self.discount)
+
+    def save(self, *args, **kwargs):
+        self.effective_price = self.calculate_effective_price(self.price, self.discount)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"price", "discount"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "effective_price"}
+        super().save(*args, **kwargs)
+        # the row now holds what was saved
+        saved = self.written_fields(self.TRACKED_FIELDS, update_fields)
+        self._loaded_values = {**getattr(self, "_loaded_values", {}), **self.tracked_values(saved)}
 
     def __str__(self):
         return f"{self.name} - {self.supplier.full_name}"
 
+
+# tombstones for the catalog delta sync, see accounts/sync.py; plain ids since
+# they are written from post_delete while the supplier may be deleted as well
+class ProductDeletion(models.Model):
+    product_id = models.BigIntegerField()
+    supplier_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["supplier_id", "deleted_at"], name="product_deletion_idx"),
+        ]
+
+    def __str__(self):
+        return f"Product #{self.product_id} deleted {self.deleted_at}"
+
+
+class ProductImageVariant(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="image_variants")
+    name = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    file = models.FileField(upload_to="products/variants/")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # uploaded file name or URL the variant was generated from
+    source = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("product", "name", "format")
+
+    def __str__(self):
+        return f"{self.product_id} {self.name}.{self.format}"
+
+
+# source of the last variant generation attempt per product, failed ones
+# included, so an unchanged source is not fetched again on every save. Kept out
+# of Product so saving a stale instance cannot overwrite it.
+class ProductImageAttempt(models.Model):
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="image_attempt"
+    )
+    source = models.CharField(max_length=500, blank=True)
+    succeeded = models.BooleanField(default=False)
+    attempted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_id} {self.source}"
+
+
+# SQL counterpart of Product.calculate_effective_price for queryset.update();
+# pass the new price/discount expressions when they change in the same UPDATE
+def effective_price_expression(price=F("price"), discount=F("discount")):
+    output = models.DecimalField(max_digits=10, decimal_places=2)
+    hundred = Value(Decimal("100"), output_field=output)
+    return Round(price * (hundred - discount) / hundred, 2, output_field=output)
+
+
+class ProductSearchDocument(models.Model):
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    supplier = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    name = models.CharField(max_length=120)
+    category = models.CharField(max_length=100)
+    supplier_name = models.CharField(max_length=255, blank=True)
+    description = models.TextField(blank=True)
+    # only populated by the PostgreSQL backend (GIN index added in migration)
+    vector = SearchVectorField(null=True)
+
+    def __str__(self):
+        return f"Search document for product #{self.product_id}"
+
+
+class ProductSearchTerm(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="search_terms")
+    supplier = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ("product", "term")
+        indexes = [
+            models.Index(fields=["supplier", "term"], name="search_term_supplier_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> product #{self.product_id}"
+
+
+class ProductTrigram(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="name_trigrams")
+    supplier = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ("product", "gram")
+        indexes = [
+            models.Index(fields=["supplier", "gram"], name="trigram_supplier_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.gram!r} -> product #{self.product_id}"
+
+
 class LinkRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -130,6 +319,10 @@ class LinkRequest(models.Model):
 
     class Meta:
         unique_together = (("supplier", "consumer"),)
+        indexes = [
+            models.Index(fields=["consumer", "status"], name="link_consumer_status_idx"),
+            models.Index(fields=["supplier", "status", "created_at"], name="link_supplier_status_idx"),
+        ]
 
     def __str__(self):
         return f"{self.consumer.full_name} → {self.supplier.full_name} [{self.status}]"
@@ -156,6 +349,24 @@ class CartItem(models.Model):
         return f"{self.consumer.full_name} – {self.product.name} x{self.quantity}"
 
 
+# Stock held for a cart line until expires_at. Available stock is the
+# product's stock minus the unexpired reservations of other consumers.
+class StockReservation(models.Model):
+    cart_item = models.OneToOneField(CartItem, on_delete=models.CASCADE, related_name="reservation")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "expires_at"], name="reservation_product_idx"),
+            models.Index(fields=["expires_at"], name="reservation_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} x{self.quantity} until {self.expires_at}"
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -179,6 +390,21 @@ class Order(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["supplier", "status", "created_at"], name="order_supplier_status_idx"),
+            models.Index(fields=["supplier", "created_at"], name="order_supplier_created_idx"),
+            models.Index(fields=["consumer", "status"], name="order_consumer_status_idx"),
+            models.Index(fields=["consumer", "created_at"], name="order_consumer_created_idx"),
+            # the supplier's open orders, newest first; stays small while the
+            # delivered and cancelled history grows
+            models.Index(
+                fields=["supplier", "created_at"],
+                condition=models.Q(status__in=["pending", "approved"]),
+                name="order_supplier_open_idx",
+            ),
+        ]
+
     def __str__(self):
         supplier_name = self.supplier.full_name if self.supplier else "Deleted Supplier"
         return f"Order #{self.id} {self.consumer.full_name} -> {supplier_name}"
@@ -256,6 +482,11 @@ class Message(models.Model):
     )
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "timestamp"], name="message_room_timestamp_idx"),
+        ]
+
     def __str__(self):
         return f"[{self.timestamp}] {self.sender.full_name}: {self.text[:30] if self.text else self.message_type}"
 
@@ -297,5 +528,40 @@ class Complaint(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["supplier", "status", "created_at"], name="complaint_supplier_status_idx"),
+            models.Index(fields=["supplier", "created_at"], name="complaint_supplier_created_idx"),
+            models.Index(fields=["consumer", "created_at"], name="complaint_consumer_created_idx"),
+        ]
+
     def __str__(self):
         return f"Complaint #{self.id} – {self.title}"
+
+
+class IdempotencyKey(models.Model):
+    STATUS_CHOICES = [
+        ("in_progress", "In progress"),
+        ("completed", "Completed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="in_progress")
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    # the rendered response, replayed byte for byte
+    response_body = models.BinaryField(null=True, blank=True)
+    response_content_type = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="idempotency_user_key_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["created_at"], name="idempotency_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status})"
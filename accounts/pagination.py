@@ -0,0 +1,170 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes down to milliseconds, which would make
+    # a cursor on created_at skip rows from the same millisecond
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+# Cursor pagination over a unique composite ordering, e.g. ("name", "id").
+# Pages seek past the last seen row instead of using OFFSET, so deep pages
+# cost the same as the first one. Opt-in: without ?cursor= or ?page_size=
+# the view returns the full list as before.
+class KeysetPagination(BasePagination):
+    ordering = ("name", "id")
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_ordering_fields(view)
+        self.model = queryset.model
+
+        values, reverse = self.decode_cursor(request)
+        fields = [(name, not descending) for name, descending in self.fields] if reverse else self.fields
+
+        queryset = queryset.order_by(*[f"-{name}" if descending else name for name, descending in fields])
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(fields, values))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        self.page = results
+        return results
+
+    def get_ordering_fields(self, view):
+        ordering = getattr(view, "keyset_ordering", None) or self.ordering
+        return [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def keyset_filter(self, fields, values):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y), plus a leading
+        # range on the first column so the planner can seek into the index.
+        condition = Q()
+        for index, (name, descending) in enumerate(fields):
+            clause = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+            for prev_index in range(index):
+                clause &= Q(**{fields[prev_index][0]: values[prev_index]})
+            condition |= clause
+
+        first_name, first_descending = fields[0]
+        leading = Q(**{f"{first_name}__{'lte' if first_descending else 'gte'}": values[0]})
+        return leading & condition
+
+    def encode_cursor(self, obj, reverse):
+        payload = {
+            "v": [getattr(obj, name) for name, _ in self.fields],
+            "r": reverse,
+        }
+        raw = json.dumps(payload, cls=CursorEncoder, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            raw_values = payload["v"]
+            reverse = bool(payload.get("r", False))
+            if len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [
+                self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, raw_values)
+            ]
+        except (KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values, reverse
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1], False)
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(self.page[0], True)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class CatalogPagination(KeysetPagination):
+    ordering = ("name", "id")
+    page_size = settings.CATALOG_PAGE_SIZE
+    max_page_size = settings.CATALOG_MAX_PAGE_SIZE
+
+
+class LinkPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = settings.LINK_PAGE_SIZE
+    max_page_size = settings.LINK_MAX_PAGE_SIZE
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = settings.ORDER_PAGE_SIZE
+    max_page_size = settings.ORDER_MAX_PAGE_SIZE
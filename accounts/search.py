@@ -0,0 +1,334 @@
+import difflib
+import math
+import re
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramWordSimilarity,
+)
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, When
+from django.utils.module_loading import import_string
+
+from .models import Product, ProductSearchDocument, ProductSearchTerm, ProductTrigram, User
+
+TOKEN_RE = re.compile(r"\w+")
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = 64
+PREFIX_UPPER_BOUND = "\U0010ffff"
+
+# weight of a term depending on the field it comes from
+FIELD_WEIGHTS = {
+    "name": 8,
+    "category": 4,
+    "supplier_name": 4,
+    "description": 1,
+}
+DOCUMENT_FIELDS = ["supplier", "name", "category", "supplier_name", "description"]
+# the Product fields a document is built from; supplier_name follows the
+# supplier (see signals.reindex_supplier_products)
+DOCUMENT_SOURCE_FIELDS = ["supplier", "name", "category", "description"]
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or "").lower())]
+
+
+# same padding as pg_trgm: two spaces before each word, one after
+def trigrams(text):
+    grams = set()
+    for word in tokenize(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def word_similarity(query, text):
+    query_grams = trigrams(query)
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+
+# trigram similarity does poorly on transposed letters ("mlik"), so candidates
+# with equal trigram scores are ordered by how close the closest word is
+def closest_word_ratio(query, text):
+    query = " ".join(tokenize(query))
+    words = tokenize(text) or [""]
+    return max(difflib.SequenceMatcher(None, query, word).ratio() for word in words)
+
+
+def rank_fuzzy(query, candidates, limit):
+    scored = [
+        ((similarity + closest_word_ratio(query, name)) / 2, pk)
+        for pk, name, similarity in candidates
+    ]
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    return [pk for _, pk in scored[:limit]]
+
+
+def build_document(product, supplier_name):
+    return ProductSearchDocument(
+        product_id=product.id,
+        supplier_id=product.supplier_id,
+        name=product.name,
+        category=product.category,
+        supplier_name=supplier_name,
+        description=product.description,
+    )
+
+
+# supplier names from the loaded suppliers, the rest in one query
+def supplier_names(products):
+    names = {
+        product.supplier_id: product.supplier.full_name
+        for product in products
+        if Product.supplier.is_cached(product)
+    }
+    missing = {product.supplier_id for product in products} - set(names)
+    if missing:
+        names.update(User.objects.filter(id__in=missing).values_list("id", "full_name"))
+    return names
+
+
+class BaseSearchBackend:
+    def index(self, products):
+        products = list(products)
+        if not products:
+            return
+        names = supplier_names(products)
+        documents = [build_document(product, names[product.supplier_id]) for product in products]
+        ProductSearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=DOCUMENT_FIELDS,
+        )
+        self.index_documents(documents)
+
+    def index_documents(self, documents):
+        raise NotImplementedError
+
+    # returns (ranked product ids, total number of matches)
+    def search(self, query, supplier_ids, limit, offset=0):
+        raise NotImplementedError
+
+    # both return [(id, name, trigram similarity), ...] for up to
+    # SEARCH_FUZZY_MAX_CANDIDATES rows above SEARCH_FUZZY_THRESHOLD
+    def fuzzy_product_candidates(self, query, supplier_ids):
+        raise NotImplementedError
+
+    def fuzzy_supplier_candidates(self, query, supplier_ids):
+        suppliers = User.objects.filter(id__in=supplier_ids).values_list("id", "full_name")
+        candidates = [
+            (pk, full_name, word_similarity(query, full_name))
+            for pk, full_name in suppliers
+        ]
+        return [c for c in candidates if c[2] >= settings.SEARCH_FUZZY_THRESHOLD]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    def __init__(self):
+        self.config = settings.SEARCH_TEXT_CONFIG
+
+    def get_vector(self):
+        return (
+            SearchVector("name", weight="A", config=self.config)
+            + SearchVector("category", weight="B", config=self.config)
+            + SearchVector("supplier_name", weight="B", config=self.config)
+            + SearchVector("description", weight="C", config=self.config)
+        )
+
+    def index_documents(self, documents):
+        ProductSearchDocument.objects.filter(
+            product_id__in=[document.product_id for document in documents]
+        ).update(vector=self.get_vector())
+
+    def search(self, query, supplier_ids, limit, offset=0):
+        tokens = tokenize(query)[:MAX_QUERY_TERMS]
+        if not tokens:
+            return [], 0
+
+        # tokens only contain \w characters, so building a raw tsquery is safe
+        raw = " & ".join(tokens[:-1] + [f"{tokens[-1]}:*"])
+        search_query = SearchQuery(raw, search_type="raw", config=self.config)
+
+        matches = ProductSearchDocument.objects.filter(
+            supplier_id__in=supplier_ids, vector=search_query
+        )
+        total = matches.count()
+        ids = list(
+            matches.annotate(rank=SearchRank(F("vector"), search_query))
+            .order_by("-rank", "product_id")
+            .values_list("product_id", flat=True)[offset:offset + limit]
+        )
+        return ids, total
+
+    def run_with_budget(self, queryset):
+        # stay inside the latency budget: give up on the fuzzy query instead
+        # of letting a slow trigram scan hold up the whole search request
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SET LOCAL statement_timeout = %s",
+                        [int(settings.SEARCH_FUZZY_TIMEOUT_MS)],
+                    )
+                    cursor.execute(
+                        "SET LOCAL pg_trgm.word_similarity_threshold = %s",
+                        [float(settings.SEARCH_FUZZY_THRESHOLD)],
+                    )
+                return list(queryset)
+        except OperationalError:
+            return []
+
+    def fuzzy_product_candidates(self, query, supplier_ids):
+        queryset = (
+            Product.objects.filter(supplier_id__in=supplier_ids, name__trigram_word_similar=query)
+            .annotate(similarity=TrigramWordSimilarity(query, "name"))
+            .order_by("-similarity", "id")
+            .values_list("id", "name", "similarity")[: settings.SEARCH_FUZZY_MAX_CANDIDATES]
+        )
+        return self.run_with_budget(queryset)
+
+    def fuzzy_supplier_candidates(self, query, supplier_ids):
+        queryset = (
+            User.objects.filter(id__in=supplier_ids, full_name__trigram_word_similar=query)
+            .annotate(similarity=TrigramWordSimilarity(query, "full_name"))
+            .order_by("-similarity", "id")
+            .values_list("id", "full_name", "similarity")[: settings.SEARCH_FUZZY_MAX_CANDIDATES]
+        )
+        return self.run_with_budget(queryset)
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    def index_documents(self, documents):
+        product_ids = [document.product_id for document in documents]
+        ProductSearchTerm.objects.filter(product_id__in=product_ids).delete()
+
+        terms = []
+        for document in documents:
+            weights = {}
+            for field, weight in FIELD_WEIGHTS.items():
+                for token in tokenize(getattr(document, field)):
+                    weights[token] = weights.get(token, 0) + weight
+            terms.extend(
+                ProductSearchTerm(
+                    product_id=document.product_id,
+                    supplier_id=document.supplier_id,
+                    term=term,
+                    weight=min(weight, 32767),
+                )
+                for term, weight in weights.items()
+            )
+        ProductSearchTerm.objects.bulk_create(terms, batch_size=1000)
+
+        ProductTrigram.objects.filter(product_id__in=product_ids).delete()
+        ProductTrigram.objects.bulk_create(
+            [
+                ProductTrigram(
+                    product_id=document.product_id,
+                    supplier_id=document.supplier_id,
+                    gram=gram,
+                )
+                for document in documents
+                for gram in trigrams(document.name)
+            ],
+            batch_size=1000,
+        )
+
+    def search(self, query, supplier_ids, limit, offset=0):
+        tokens = tokenize(query)[:MAX_QUERY_TERMS]
+        if not tokens:
+            return [], 0
+
+        # every token must match; the last one is treated as a prefix, written
+        # as a range so that it can use the (supplier, term) index
+        prefix = tokens[-1]
+        conditions = [Q(term=token) for token in tokens[:-1]]
+        conditions.append(Q(term__gte=prefix, term__lt=prefix + PREFIX_UPPER_BOUND))
+        matched = {
+            f"matched_{index}": Max(
+                Case(When(condition, then=1), default=0, output_field=IntegerField())
+            )
+            for index, condition in enumerate(conditions)
+        }
+
+        matches = (
+            ProductSearchTerm.objects.filter(supplier_id__in=supplier_ids)
+            .filter(reduce(or_, conditions))
+            .values("product_id")
+            .annotate(score=Sum("weight"), **matched)
+            .filter(**{name: 1 for name in matched})
+        )
+        total = matches.count()
+        ids = [
+            row["product_id"]
+            for row in matches.order_by("-score", "product_id")[offset:offset + limit]
+        ]
+        return ids, total
+
+    def fuzzy_product_candidates(self, query, supplier_ids):
+        grams = trigrams(query)
+        if not grams:
+            return []
+
+        # the number of shared trigrams is counted in SQL, so the similarity
+        # of a candidate is simply shared / len(grams)
+        min_shared = math.ceil(settings.SEARCH_FUZZY_THRESHOLD * len(grams))
+        rows = (
+            ProductTrigram.objects.filter(supplier_id__in=supplier_ids, gram__in=grams)
+            .values("product_id")
+            .annotate(shared=Count("id"))
+            .filter(shared__gte=min_shared)
+            .order_by("-shared", "product_id")[: settings.SEARCH_FUZZY_MAX_CANDIDATES]
+        )
+        shared = {row["product_id"]: row["shared"] for row in rows}
+        names = Product.objects.filter(id__in=shared).values_list("id", "name")
+        return [(pk, name, shared[pk] / len(grams)) for pk, name in names]
+
+
+def get_search_backend():
+    backend_path = settings.SEARCH_BACKEND
+    if not backend_path:
+        if connection.vendor == "postgresql":
+            return PostgresSearchBackend()
+        return InvertedIndexSearchBackend()
+    return import_string(backend_path)()
+
+
+def index_products(products):
+    get_search_backend().index(products)
+
+
+def search_products(query, supplier_ids, limit, offset=0):
+    ids, total = get_search_backend().search(query, supplier_ids, limit, offset)
+    products = (
+        Product.objects.select_related("supplier").prefetch_related("image_variants").in_bulk(ids)
+    )
+    return [products[pk] for pk in ids if pk in products], total
+
+
+def fuzzy_search_products(query, supplier_ids, limit):
+    if len(query) < settings.SEARCH_FUZZY_MIN_LENGTH:
+        return []
+    candidates = get_search_backend().fuzzy_product_candidates(query, supplier_ids)
+    ids = rank_fuzzy(query, candidates, limit)
+    products = (
+        Product.objects.select_related("supplier").prefetch_related("image_variants").in_bulk(ids)
+    )
+    return [products[pk] for pk in ids if pk in products]
+
+
+def fuzzy_search_suppliers(query, supplier_ids, limit):
+    if len(query) < settings.SEARCH_FUZZY_MIN_LENGTH:
+        return []
+    candidates = get_search_backend().fuzzy_supplier_candidates(query, supplier_ids)
+    ids = rank_fuzzy(query, candidates, limit)
+    suppliers = User.objects.select_related("company").in_bulk(ids)
+    return [suppliers[pk] for pk in ids if pk in suppliers]
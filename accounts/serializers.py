@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
 from accounts.models import *
+from accounts.auth import ClaimsRefreshToken, get_company_owner
+from accounts.images import variant_urls
 
 User = get_user_model()
 
@@ -49,7 +51,7 @@ class LoginSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError("Invalid email or password")
 
-        refresh = RefreshToken.for_user(user)
+        refresh = ClaimsRefreshToken.for_user(user)
 
         return {
             "refresh": str(refresh),
@@ -68,36 +70,123 @@ class UserSerializer(serializers.ModelSerializer):
 
 class ProductSerializer(serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.full_name', read_only=True)
-    discounted_price = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
+    discounted_price = serializers.DecimalField(
+        source="effective_price", max_digits=10, decimal_places=2, read_only=True
+    )
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'category', 'price', 'discount', 'discounted_price', 'unit', 'stock', 'minOrder',
-            'image', 'description', 'status', 'delivery_option', 'lead_time_days', 'created_at', 'supplier_name'
+            'id', 'sku', 'name', 'category', 'price', 'discount', 'discounted_price', 'unit', 'stock', 'minOrder',
+            'image', 'image_variants', 'description', 'status', 'delivery_option', 'lead_time_days', 'created_at',
+            'supplier_name'
         ]
         read_only_fields = ['supplier', 'created_at', 'supplier_name', 'discounted_price']
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj)
+
+    def get_company_owner(self):
+        return get_company_owner(self.context['request'].user)
+
+    def validate_sku(self, value):
+        if not value:
+            return None
+        if self.instance is not None:
+            supplier_id = self.instance.supplier_id
+        else:
+            supplier_id = self.get_company_owner().id
+        duplicates = Product.objects.filter(supplier_id=supplier_id, sku=value)
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError("Product with this SKU already exists")
+        return value
+
     def create(self, validated_data):
         user = self.context['request'].user
 
         if user.role not in ["owner", "manager"]:
             raise serializers.ValidationError("Only Owner and Manager can create products")
 
-        if user.role == "owner":
-            company_owner = user
-        elif user.company and user.company.owner:
-            company_owner = user.company.owner
-        else:
-            company_owner = user
-        
-        validated_data['supplier'] = company_owner
+        validated_data['supplier'] = self.get_company_owner()
         return super().create(validated_data)
 
     def update(self, instance, validated_data):
         validated_data.pop('supplier', None)
         return super().update(instance, validated_data)
 
+
+class ProductImportSerializer(ProductSerializer):
+    # rows are upserted by SKU in bulk, so uniqueness is handled by the importer
+    sku = serializers.CharField(max_length=64)
+
+    def validate_sku(self, value):
+        return value
+
+
+class ProductImageUploadSerializer(serializers.Serializer):
+    file = serializers.ImageField()
+
+    def validate_file(self, value):
+        if value.size > settings.IMAGE_MAX_SOURCE_BYTES:
+            raise serializers.ValidationError("Image is too large")
+        return value
+
+
+class BulkLinkStatusSerializer(serializers.Serializer):
+    STATUS_CHOICES = ["linked", "rejected", "blocked", "pending"]
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.LINK_BULK_MAX_IDS,
+    )
+    status = serializers.ChoiceField(choices=STATUS_CHOICES)
+
+
+class CartOperationSerializer(serializers.Serializer):
+    OP_CHOICES = ["set", "add", "remove"]
+
+    op = serializers.ChoiceField(choices=OP_CHOICES)
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        # "set" with a quantity <= 0 removes the line, like PATCH /cart/<id>/
+        if attrs["op"] != "remove" and "quantity" not in attrs:
+            raise serializers.ValidationError({"quantity": ["This field is required."]})
+        if attrs["op"] == "add" and attrs["quantity"] <= 0:
+            raise serializers.ValidationError({"quantity": ["Quantity must be > 0"]})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.CART_BATCH_MAX_OPERATIONS,
+    )
+
+
+class BulkPriceUpdateSerializer(serializers.Serializer):
+    FIELD_CHOICES = ["price", "discount"]
+    MODE_CHOICES = ["percent", "absolute"]
+
+    field = serializers.ChoiceField(choices=FIELD_CHOICES)
+    mode = serializers.ChoiceField(choices=MODE_CHOICES)
+    value = serializers.DecimalField(max_digits=10, decimal_places=2)
+    category = serializers.CharField(required=False)
+    status = serializers.ChoiceField(choices=Product.STATUS_CHOICES, required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+
+    def validate(self, attrs):
+        if attrs["mode"] == "percent" and attrs["value"] <= -100:
+            raise serializers.ValidationError("A percentage change must be greater than -100")
+        return attrs
+
+
 class LinkRequestSerializer(serializers.ModelSerializer):
     consumer_name = serializers.CharField(source='consumer.full_name', read_only=True)
     supplier_name = serializers.CharField(source='supplier.full_name', read_only=True)
@@ -145,6 +234,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         source="product.supplier_id",
         read_only=True,
     )
+    # a method field, so the price stays a JSON number as before
     product_discounted_price = serializers.SerializerMethodField()
     product_discount = serializers.DecimalField(
         source="product.discount",
@@ -152,6 +242,12 @@ class CartItemSerializer(serializers.ModelSerializer):
         max_digits=5,
         decimal_places=2,
     )
+    product_image_variants = serializers.SerializerMethodField()
+    reserved_until = serializers.DateTimeField(
+        source="reservation.expires_at",
+        read_only=True,
+        default=None,
+    )
     line_total = serializers.SerializerMethodField()
 
     class Meta:
@@ -164,25 +260,25 @@ class CartItemSerializer(serializers.ModelSerializer):
             "product_discounted_price",
             "product_discount",
             "product_image",
+            "product_image_variants",
             "product_unit",
             "product_min_order",
             "product_supplier_id",
             "product_stock",
             "quantity",
+            "reserved_until",
             "added_at",
             "line_total",
         ]
 
+    def get_product_image_variants(self, obj):
+        return variant_urls(obj.product)
+
     def get_product_discounted_price(self, obj):
-        product = obj.product
-        if hasattr(product, 'discounted_price'):
-            return product.discounted_price
-        return product.price
+        return obj.product.effective_price
 
     def get_line_total(self, obj):
-        product = obj.product
-        item_price = product.discounted_price if hasattr(product, 'discounted_price') else product.price
-        return item_price * obj.quantity
+        return obj.product.effective_price * obj.quantity
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
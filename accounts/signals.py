@@ -0,0 +1,111 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .auth import mark_membership_changed
+from .cache import bump_cart_version, bump_catalog_version
+from .images import attempted_source, image_source, schedule_variants
+from .links import bump_link_version, link_statuses_changed
+from .models import CartItem, LinkRequest, Product, ProductDeletion, ProductImageVariant, ProductSearchDocument, User
+from . import search
+
+
+# price, stock and status edits leave the search document alone
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not instance.has_changed(*search.DOCUMENT_SOURCE_FIELDS, update_fields=update_fields):
+        return
+    search.index_products([instance])
+
+
+@receiver(post_save, sender=Product)
+def refresh_image_variants(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    if raw or not instance.has_changed("image", "image_file", update_fields=update_fields):
+        return
+    source = image_source(instance)
+    if created:
+        if source:
+            schedule_variants(instance.id)
+        return
+    if source != attempted_source(instance.id):
+        schedule_variants(instance.id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_catalog_version(instance.supplier_id)
+
+
+@receiver(post_delete, sender=Product)
+def record_deletion(sender, instance, **kwargs):
+    ProductDeletion.objects.create(product_id=instance.id, supplier_id=instance.supplier_id)
+
+
+@receiver(post_delete, sender=ProductImageVariant)
+def delete_variant_file(sender, instance, **kwargs):
+    instance.file.delete(save=False)
+
+
+@receiver(post_save, sender=LinkRequest)
+@receiver(post_delete, sender=LinkRequest)
+def invalidate_links(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_link_version(instance.consumer_id)
+
+
+@receiver(link_statuses_changed)
+def invalidate_bulk_links(sender, consumer_ids, **kwargs):
+    bump_link_version(*consumer_ids)
+
+
+# bulk cart writes bump the version themselves (inventory.apply_cart_operations)
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_cart_version(instance.consumer_id)
+
+
+# access tokens of deactivated or deleted users must stop working before
+# they expire; the marker sends them through the database check
+@receiver(post_save, sender=User)
+def revoke_inactive_user_claims(sender, instance, raw=False, **kwargs):
+    if raw or instance.is_active:
+        return
+    mark_membership_changed(instance.id)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_claims(sender, instance, **kwargs):
+    mark_membership_changed(instance.id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_supplier_catalog(sender, instance, raw=False, update_fields=None, **kwargs):
+    # catalog entries embed supplier_name
+    if raw or instance.role != "owner":
+        return
+    if update_fields is None or "full_name" in update_fields:
+        bump_catalog_version(instance.id)
+
+
+@receiver(post_save, sender=User)
+def reindex_supplier_products(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.role != "owner":
+        return
+    if update_fields is not None and "full_name" not in update_fields:
+        return
+
+    stale = ProductSearchDocument.objects.filter(supplier=instance).exclude(
+        supplier_name=instance.full_name
+    )
+    if stale.exists():
+        products = Product.objects.filter(supplier=instance).select_related("supplier")
+        search.index_products(products)
+        # supplier_name is part of the synced product payload
+        products.update(updated_at=timezone.now())
@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, Trunc
+from rest_framework.exceptions import ValidationError
+
+from .filters import date_range_filter
+
+GRANULARITIES = ["day", "week", "month"]
+
+ACTIVE_STATUSES = ["pending", "approved"]
+
+
+def delivered_total():
+    return Coalesce(
+        Sum("total_price", filter=Q(status="delivered")),
+        Value(Decimal("0")),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def consumer_metrics():
+    return {
+        "completed_orders": Count("id", filter=Q(status="delivered")),
+        "in_progress_orders": Count("id", filter=Q(status__in=ACTIVE_STATUSES)),
+        "cancelled_orders": Count("id", filter=Q(status="cancelled")),
+        "total_spent": delivered_total(),
+    }
+
+
+def supplier_metrics():
+    return {
+        "active_orders": Count("id", filter=Q(status__in=ACTIVE_STATUSES)),
+        "completed_orders": Count("id", filter=Q(status="delivered")),
+        "pending_deliveries": Count("id", filter=Q(status="approved")),
+        "total_revenue": delivered_total(),
+    }
+
+
+# Totals and a per-period series over ?from= / ?to= from one GROUP BY
+# period query with conditional aggregates; the totals are the sum of the
+# periods.
+def order_stats(orders, params, metrics):
+    granularity = params.get("granularity") or "month"
+    if granularity not in GRANULARITIES:
+        raise ValidationError({"granularity": [f"Must be one of: {', '.join(GRANULARITIES)}"]})
+
+    rows = list(
+        orders.filter(date_range_filter(params))
+        .annotate(period=Trunc("created_at", granularity))
+        .values("period")
+        .annotate(**metrics)
+        .order_by("period")
+    )
+
+    return {
+        **{name: sum(row[name] for row in rows) for name in metrics},
+        "granularity": granularity,
+        "series": [
+            {"period": row["period"].date().isoformat(), **{name: row[name] for name in metrics}}
+            for row in rows
+        ],
+    }
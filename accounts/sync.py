@@ -0,0 +1,67 @@
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .models import Product, ProductDeletion
+from .serializers import ProductSerializer
+
+
+def format_watermark(value):
+    # "Z" rather than "+00:00", which turns into a space in an unencoded query string
+    return value.astimezone(dt_timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def parse_watermark(value):
+    if not value:
+        return None
+    try:
+        watermark = parse_datetime(value)
+    except ValueError:
+        watermark = None
+    if watermark is None:
+        raise ValidationError({"since": ["Must be a watermark returned by a previous sync"]})
+    if timezone.is_naive(watermark):
+        watermark = timezone.make_aware(watermark, dt_timezone.utc)
+    return watermark
+
+
+# Products written since the watermark, split into changed (active) and
+# deactivated ones, plus tombstones of deleted products. The client asks for
+# a full reload (reset) when it has no watermark, when the watermark is older
+# than the tombstone retention or when the delta would be too large.
+def catalog_changes(supplier_id, since):
+    started = timezone.now()
+    watermark = format_watermark(started - timedelta(seconds=settings.CATALOG_SYNC_OVERLAP_SECONDS))
+    reset = {"reset": True, "watermark": watermark, "changed": [], "deactivated": [], "deleted": []}
+
+    retention = timedelta(days=settings.CATALOG_SYNC_RETENTION_DAYS)
+    if since is None or since < started - retention:
+        return reset
+
+    limit = settings.CATALOG_SYNC_MAX_CHANGES
+    products = list(
+        Product.objects.filter(supplier_id=supplier_id, updated_at__gte=since)
+        .select_related("supplier")
+        .prefetch_related("image_variants")
+        .order_by("updated_at", "id")[: limit + 1]
+    )
+    deleted = list(
+        ProductDeletion.objects.filter(supplier_id=supplier_id, deleted_at__gte=since)
+        .order_by("deleted_at")
+        .values_list("product_id", flat=True)[: limit + 1]
+    )
+    if len(products) + len(deleted) > limit:
+        return reset
+
+    return {
+        "reset": False,
+        "watermark": watermark,
+        "changed": ProductSerializer(
+            [product for product in products if product.status == "active"], many=True
+        ).data,
+        "deactivated": [product.id for product in products if product.status != "active"],
+        "deleted": deleted,
+    }
@@ -1,6 +1,9 @@
+from django.core.cache import cache, caches
 from django.urls import reverse
-from rest_framework.test import APITestCase
-from accounts.models import User, Product, LinkRequest, CartItem, Order
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.auth import ClaimsJWTAuthentication
+from accounts.models import User, Company, Product, LinkRequest, CartItem, Order
 from rest_framework import status
 
 def create_user(email, role, password="Pass123!"):
@@ -39,3 +42,79 @@ class LoginTests(APITestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertIn("access", response.data)
+
+
+class TokenClaimsTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches["auth"].clear()
+        self.owner = create_user("owner@test.com", "owner")
+        self.owner.company = Company.objects.create(name="Dairy", owner=self.owner)
+        self.owner.save()
+        self.manager = create_user("manager@test.com", "manager")
+        self.manager.company = self.owner.company
+        self.manager.save()
+        Product.objects.create(supplier=self.owner, name="Milk", price=100)
+
+    def login(self, email):
+        return self.client.post(reverse("login"), {
+            "email": email, "password": "Pass123!"
+        }).data
+
+    def test_access_token_carries_company_claims(self):
+        tokens = self.login("manager@test.com")
+        claims = AccessToken(tokens["access"])
+        self.assertEqual(claims["role"], "manager")
+        self.assertEqual(claims["company_owner_id"], self.owner.id)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        # products + image variants: no user, company or owner lookups
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("product-list-create"))
+        self.assertEqual([p["name"] for p in response.json()], ["Milk"])
+
+    def test_claims_user_has_role_and_company(self):
+        tokens = self.login("manager@test.com")
+        request = APIRequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        with self.assertNumQueries(0):
+            user, _ = ClaimsJWTAuthentication().authenticate(request)
+            self.assertEqual((user.id, user.role, user.company_id), (self.manager.id, "manager", self.owner.company.id))
+            self.assertEqual(user.company_owner_id, self.owner.id)
+        # everything else is loaded on first access
+        self.assertEqual(user.full_name, "manager")
+
+    def test_deactivated_user_token_is_rejected(self):
+        tokens = self.login("manager@test.com")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(reverse("product-list-create")).status_code, 200)
+
+        self.manager.is_active = False
+        self.manager.save()
+
+        self.assertEqual(self.client.get(reverse("product-list-create")).status_code, 401)
+
+    def test_markers_survive_shared_cache_churn(self):
+        tokens = self.login("manager@test.com")
+        self.manager.is_active = False
+        self.manager.save()
+
+        # fill the shared cache far past its default MAX_ENTRIES
+        cache.set_many({f"churn:{index}": index for index in range(1000)})
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(reverse("product-list-create")).status_code, 401)
+
+    def test_removed_employee_token_falls_back_to_database(self):
+        tokens = self.login("manager@test.com")
+
+        self.client.force_authenticate(self.owner)
+        self.client.post("/api/accounts/company/remove/", {"user_id": self.manager.id})
+        self.client.force_authenticate(None)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.assertEqual(self.client.get(reverse("product-list-create")).json(), [])
+
+        refreshed = self.client.post(reverse("token_refresh"), {"refresh": tokens["refresh"]}).data
+        self.assertIsNone(AccessToken(refreshed["access"])["company_owner_id"])
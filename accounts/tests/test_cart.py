@@ -1,6 +1,12 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
-from accounts.models import User, Product, LinkRequest, CartItem, Order
+from accounts.inventory import reserve_cart_item
+from accounts.models import User, Product, LinkRequest, CartItem, Order, StockReservation
 from rest_framework import status
 
 def create_user(email, role, password="Pass123!"):
@@ -37,3 +43,161 @@ class CartTests(APITestCase):
 
         self.assertEqual(response.status_code, 201)
         self.assertEqual(CartItem.objects.count(), 1)
+
+    def test_cart_prices_are_json_numbers(self):
+        self.client.force_authenticate(self.consumer)
+        CartItem.objects.create(consumer=self.consumer, product=self.product, quantity=2)
+
+        line = self.client.get(reverse("cart-list")).json()[0]
+
+        self.assertEqual(line["product_discounted_price"], 100)
+        self.assertEqual(line["line_total"], 200)
+
+
+class StockReservationTests(APITestCase):
+
+    def setUp(self):
+        self.owner = create_user("o@test.com", "owner")
+        self.alice = create_user("alice@test.com", "consumer")
+        self.bob = create_user("bob@test.com", "consumer")
+        for consumer in (self.alice, self.bob):
+            LinkRequest.objects.create(supplier=self.owner, consumer=consumer, status="linked")
+        self.product = Product.objects.create(supplier=self.owner, name="Bread", price=100, stock=5)
+
+    def add(self, consumer, quantity):
+        self.client.force_authenticate(consumer)
+        return self.client.post(reverse("cart-add"), {"product_id": self.product.id, "quantity": quantity})
+
+    def test_cart_add_holds_stock_for_other_consumers(self):
+        response = self.add(self.alice, 3)
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNotNone(response.data["reserved_until"])
+
+        response = self.add(self.bob, 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["detail"], "Only 2 kg available")
+
+        # the consumer's own hold does not count against them
+        self.assertEqual(self.add(self.alice, 2).status_code, 201)
+        self.assertEqual(StockReservation.objects.get().quantity, 5)
+
+    def test_expired_hold_is_released(self):
+        self.add(self.alice, 4)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.add(self.bob, 4).status_code, 201)
+
+        call_command("release_expired_reservations", stdout=StringIO())
+        self.assertEqual(list(StockReservation.objects.values_list("cart_item__consumer", flat=True)), [self.bob.id])
+
+        # bob holds the stock now, so alice's stale cart cannot check out
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse("checkout"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Only 1", response.data["detail"])
+
+        self.client.force_authenticate(self.bob)
+        self.assertEqual(self.client.post(reverse("checkout")).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 1)
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class CartBatchTests(APITestCase):
+
+    def setUp(self):
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(supplier=self.owner, consumer=self.consumer, status="linked")
+        self.bread = Product.objects.create(supplier=self.owner, name="Bread", price=100, stock=5)
+        self.milk = Product.objects.create(supplier=self.owner, name="Milk", price=50, stock=10, minOrder=2)
+        self.salt = Product.objects.create(supplier=self.owner, name="Salt", price=20, stock=10)
+        CartItem.objects.create(consumer=self.consumer, product=self.bread, quantity=1)
+        CartItem.objects.create(consumer=self.consumer, product=self.salt, quantity=3)
+        self.client.force_authenticate(self.consumer)
+
+    def test_applies_all_operations(self):
+        response = self.client.post(reverse("cart-batch"), {"operations": [
+            {"op": "add", "product_id": self.bread.id, "quantity": 2},
+            {"op": "set", "product_id": self.milk.id, "quantity": 4},
+            {"op": "remove", "product_id": self.salt.id},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        lines = {line["product"]: line["quantity"] for line in response.data}
+        self.assertEqual(lines, {self.bread.id: 3, self.milk.id: 4})
+        self.assertEqual(StockReservation.objects.count(), 2)
+
+    def test_invalid_line_leaves_cart_unchanged(self):
+        response = self.client.post(reverse("cart-batch"), {"operations": [
+            {"op": "set", "product_id": self.bread.id, "quantity": 2},
+            {"op": "set", "product_id": self.milk.id, "quantity": 1},
+            {"op": "add", "product_id": self.salt.id, "quantity": 20},
+        ]}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"], [
+            {"product_id": self.milk.id, "detail": "Minimum order is 2 kg"},
+            {"product_id": self.salt.id, "detail": "Only 10 kg available"},
+        ])
+        self.assertEqual(CartItem.objects.get(product=self.bread).quantity, 1)
+        self.assertEqual(CartItem.objects.count(), 2)
+
+
+class CartSummaryTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        self.other = create_user("o2@test.com", "owner")
+        self.bread = Product.objects.create(supplier=self.owner, name="Bread", price=100, discount=10, stock=5)
+        self.milk = Product.objects.create(supplier=self.owner, name="Milk", price=50, stock=1)
+        self.salt = Product.objects.create(supplier=self.other, name="Salt", price=20, stock=10)
+        CartItem.objects.create(consumer=self.consumer, product=self.bread, quantity=2)
+        CartItem.objects.create(consumer=self.consumer, product=self.milk, quantity=3)
+        CartItem.objects.create(consumer=self.consumer, product=self.salt, quantity=1)
+        self.client.force_authenticate(self.consumer)
+
+    def test_summary_totals_per_supplier(self):
+        response = self.client.get(reverse("cart-summary"))
+
+        self.assertEqual(response.status_code, 200)
+        suppliers = {row["supplier_id"]: row for row in response.data["suppliers"]}
+        self.assertEqual(suppliers[self.owner.id]["item_count"], 2)
+        self.assertEqual(suppliers[self.owner.id]["units"], 5)
+        self.assertEqual(suppliers[self.owner.id]["subtotal"], 330)
+        self.assertEqual(suppliers[self.owner.id]["savings"], 20)
+        self.assertEqual(suppliers[self.other.id]["subtotal"], 20)
+        self.assertEqual(response.data["total"], 350)
+        self.assertEqual(response.data["item_count"], 3)
+        self.assertEqual(response.data["stock_warnings"], [
+            {"product_id": self.milk.id, "product_name": "Milk", "quantity": 3, "available": 1},
+        ])
+
+    def test_summary_is_cached_until_cart_or_product_changes(self):
+        self.client.get(reverse("cart-summary"))
+        # totals come from the cache; stock warnings are read live
+        with self.assertNumQueries(2):
+            self.client.get(reverse("cart-summary"))
+
+        self.milk.stock = 3
+        self.milk.save()
+        response = self.client.get(reverse("cart-summary"))
+        self.assertEqual(response.data["stock_warnings"], [])
+
+        CartItem.objects.filter(product=self.salt).delete()
+        response = self.client.get(reverse("cart-summary"))
+        self.assertEqual(response.data["total"], 330)
+
+    def test_other_consumers_reservations_raise_stock_warnings(self):
+        self.client.get(reverse("cart-summary"))
+        other = create_user("c2@test.com", "consumer")
+        reserve_cart_item(other, self.bread, 4)
+
+        response = self.client.get(reverse("cart-summary"))
+
+        self.assertIn(
+            {"product_id": self.bread.id, "product_name": "Bread", "quantity": 2, "available": 1},
+            response.data["stock_warnings"],
+        )
@@ -0,0 +1,290 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from accounts.models import User, Product, LinkRequest
+
+
+def create_user(email, role, password="Pass123!"):
+    return User.objects.create_user(
+        email=email,
+        password=password,
+        full_name=email.split("@")[0],
+        role=role
+    )
+
+class CatalogPaginationTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(
+            supplier=self.owner, consumer=self.consumer, status="linked"
+        )
+        for name in ["Milk", "Bread", "Apples", "Milk", "Cheese"]:
+            Product.objects.create(supplier=self.owner, name=name, price=100, stock=5)
+        Product.objects.create(
+            supplier=self.owner, name="Butter", price=100, stock=5, status="inactive"
+        )
+        self.url = reverse("supplier-catalog", args=[self.owner.id])
+        self.client.force_authenticate(self.consumer)
+
+    def test_catalog_without_params_returns_full_list(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [p["name"] for p in response.json()],
+            ["Apples", "Bread", "Cheese", "Milk", "Milk"]
+        )
+
+    def test_catalog_cursor_walks_forward_and_back(self):
+        response = self.client.get(self.url, {"page_size": 2})
+        first = response.json()
+        self.assertEqual([p["name"] for p in first["results"]], ["Apples", "Bread"])
+        self.assertIsNone(first["previous"])
+
+        second = self.client.get(first["next"]).json()
+        self.assertEqual([p["name"] for p in second["results"]], ["Cheese", "Milk"])
+
+        third = self.client.get(second["next"]).json()
+        self.assertEqual([p["name"] for p in third["results"]], ["Milk"])
+        self.assertIsNone(third["next"])
+
+        ids = [p["id"] for p in second["results"] + third["results"]]
+        self.assertEqual(len(set(ids)), 3)
+
+        back = self.client.get(third["previous"]).json()
+        self.assertEqual(back["results"], second["results"])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+
+class CatalogCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(
+            supplier=self.owner, consumer=self.consumer, status="linked"
+        )
+        self.product = Product.objects.create(
+            supplier=self.owner, name="Milk", price=100, stock=5
+        )
+        self.url = reverse("supplier-catalog", args=[self.owner.id])
+        self.client.force_authenticate(self.consumer)
+
+    def test_second_read_skips_product_query(self):
+        self.client.get(self.url)
+
+        # the link check is served from the link cache
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()[0]["name"], "Milk")
+
+    def test_cache_key_ignores_unknown_and_reordered_params(self):
+        self.client.get(self.url, {"category": "dairy,bakery", "page_size": "5"})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, {"page_size": "5", "category": "bakery,dairy", "junk": "1"}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()["next"])
+
+    def test_product_changes_invalidate_cache(self):
+        self.client.get(self.url)
+
+        self.product.name = "Milk 3.2%"
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).json()[0]["name"], "Milk 3.2%")
+
+        self.client.force_authenticate(self.owner)
+        self.client.patch(reverse("product-status-toggle", args=[self.product.id]))
+        self.client.force_authenticate(self.consumer)
+        self.assertEqual(self.client.get(self.url).json(), [])
+
+    def test_blocking_link_revokes_cached_access(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        link = LinkRequest.objects.get(consumer=self.consumer)
+        self.client.force_authenticate(self.owner)
+        self.client.post(reverse("block-link", args=[link.id]))
+        self.client.force_authenticate(self.consumer)
+
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class CatalogFacetTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(
+            supplier=self.owner, consumer=self.consumer, status="linked"
+        )
+        Product.objects.create(
+            supplier=self.owner, name="Milk", category="Dairy", price=500, stock=5,
+            delivery_option="delivery"
+        )
+        Product.objects.create(
+            supplier=self.owner, name="Cheese", category="Dairy", price=3000, stock=0,
+            delivery_option="pickup"
+        )
+        Product.objects.create(
+            supplier=self.owner, name="Bread", category="Bakery", price=200, stock=5,
+            delivery_option="both", unit="pcs"
+        )
+        self.url = reverse("supplier-catalog", args=[self.owner.id])
+        self.client.force_authenticate(self.consumer)
+
+    def names(self, params):
+        return [p["name"] for p in self.client.get(self.url, params).json()]
+
+    def test_filters(self):
+        self.assertEqual(self.names({"category": "Dairy"}), ["Cheese", "Milk"])
+        self.assertEqual(self.names({"min_price": 300, "max_price": 1000}), ["Milk"])
+        self.assertEqual(self.names({"delivery_option": "pickup,both"}), ["Bread", "Cheese"])
+        self.assertEqual(self.names({"unit": "pcs"}), ["Bread"])
+        self.assertEqual(self.names({"in_stock": "true"}), ["Bread", "Milk"])
+
+    def test_invalid_price_returns_400(self):
+        response = self.client.get(self.url, {"min_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_finite_price_returns_400(self):
+        for value in ("NaN", "sNaN", "Infinity", "-inf"):
+            response = self.client.get(self.url, {"min_price": value})
+            self.assertEqual(response.status_code, 400, value)
+            response = self.client.get(self.url, {"max_price": value})
+            self.assertEqual(response.status_code, 400, value)
+
+    def test_facets_are_counted_in_one_query(self):
+        self.client.get(self.url)
+
+        # facets + products + image variants
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {"facets": "1"})
+        facets = response.json()["facets"]
+
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertEqual(facets["total"], 3)
+        self.assertEqual(
+            facets["categories"],
+            [{"value": "Bakery", "count": 1}, {"value": "Dairy", "count": 2}]
+        )
+        self.assertEqual(
+            {d["value"]: d["count"] for d in facets["delivery_options"]},
+            {"delivery": 1, "pickup": 1, "both": 1}
+        )
+        self.assertEqual(
+            [b["count"] for b in facets["price_buckets"]], [2, 1, 0, 0, 0]
+        )
+
+    def test_facets_follow_filters_and_pagination(self):
+        data = self.client.get(
+            self.url, {"facets": "1", "in_stock": "1", "page_size": 1}
+        ).json()
+
+        self.assertEqual([p["name"] for p in data["results"]], ["Bread"])
+        self.assertIsNotNone(data["next"])
+        self.assertEqual(data["facets"]["total"], 2)
+
+
+class CatalogPriceOrderingTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(
+            supplier=self.owner, consumer=self.consumer, status="linked"
+        )
+        Product.objects.create(supplier=self.owner, name="Milk", price=100)
+        Product.objects.create(supplier=self.owner, name="Cheese", price=300, discount=90)
+        Product.objects.create(supplier=self.owner, name="Bread", price=50)
+        self.url = reverse("supplier-catalog", args=[self.owner.id])
+        self.client.force_authenticate(self.consumer)
+
+    def test_ordering_and_filters_use_effective_price(self):
+        data = self.client.get(self.url, {"ordering": "price"}).json()
+        self.assertEqual([p["name"] for p in data], ["Cheese", "Bread", "Milk"])
+        self.assertEqual(data[0]["discounted_price"], "30.00")
+
+        data = self.client.get(self.url, {"max_price": 60}).json()
+        self.assertEqual([p["name"] for p in data], ["Bread", "Cheese"])
+
+    def test_price_keyset_pages(self):
+        first = self.client.get(self.url, {"ordering": "-price", "page_size": 2}).json()
+        second = self.client.get(first["next"]).json()
+
+        self.assertEqual([p["name"] for p in first["results"]], ["Milk", "Bread"])
+        self.assertEqual([p["name"] for p in second["results"]], ["Cheese"])
+
+    def test_unknown_ordering_returns_400(self):
+        response = self.client.get(self.url, {"ordering": "stock"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CATALOG_SYNC_OVERLAP_SECONDS=0)
+class CatalogSyncTests(APITestCase):
+
+    def setUp(self):
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(
+            supplier=self.owner, consumer=self.consumer, status="linked"
+        )
+        self.milk = Product.objects.create(supplier=self.owner, name="Milk", price=100)
+        self.bread = Product.objects.create(supplier=self.owner, name="Bread", price=50)
+        self.salt = Product.objects.create(supplier=self.owner, name="Salt", price=10)
+        Product.objects.create(supplier=self.owner, name="Sugar", price=20)
+        self.url = reverse("supplier-catalog-sync", args=[self.owner.id])
+        self.client.force_authenticate(self.consumer)
+
+    def test_first_sync_asks_for_full_reload(self):
+        data = self.client.get(self.url).json()
+
+        self.assertTrue(data["reset"])
+        self.assertTrue(data["watermark"].endswith("Z"))
+
+    def test_delta_contains_only_changes(self):
+        watermark = self.client.get(self.url).json()["watermark"]
+
+        self.milk.price = 120
+        self.milk.save()
+        self.bread.status = "inactive"
+        self.bread.save()
+        salt_id = self.salt.id
+        self.salt.delete()
+
+        data = self.client.get(self.url, {"since": watermark}).json()
+
+        self.assertFalse(data["reset"])
+        self.assertEqual([p["name"] for p in data["changed"]], ["Milk"])
+        self.assertEqual(data["deactivated"], [self.bread.id])
+        self.assertEqual(data["deleted"], [salt_id])
+
+        data = self.client.get(self.url, {"since": data["watermark"]}).json()
+        self.assertEqual((data["changed"], data["deactivated"], data["deleted"]), ([], [], []))
+
+    def test_bulk_price_update_is_synced(self):
+        watermark = self.client.get(self.url).json()["watermark"]
+
+        self.client.force_authenticate(self.owner)
+        self.client.post(reverse("product-bulk-price"), {
+            "field": "discount", "mode": "absolute", "value": "10", "ids": [self.milk.id]
+        }, format="json")
+        self.client.force_authenticate(self.consumer)
+
+        data = self.client.get(self.url, {"since": watermark}).json()
+        self.assertEqual([p["discounted_price"] for p in data["changed"]], ["90.00"])
+
+    def test_invalid_watermark_returns_400(self):
+        response = self.client.get(self.url, {"since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
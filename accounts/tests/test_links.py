@@ -1,3 +1,5 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from accounts.models import User, Product, LinkRequest, CartItem, Order
@@ -42,3 +44,118 @@ class LinkTests(APITestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(link.status, "linked")
+
+
+class BulkLinkStatusTests(APITestCase):
+
+    def setUp(self):
+        self.owner = create_user("o@test.com", "owner")
+        self.other_owner = create_user("other@test.com", "owner")
+        self.pending = [
+            LinkRequest.objects.create(
+                supplier=self.owner, consumer=create_user(f"c{i}@test.com", "consumer")
+            )
+            for i in range(3)
+        ]
+        self.blocked = LinkRequest.objects.create(
+            supplier=self.owner, consumer=create_user("b@test.com", "consumer"), status="blocked"
+        )
+        self.foreign = LinkRequest.objects.create(
+            supplier=self.other_owner, consumer=create_user("f@test.com", "consumer")
+        )
+        self.client.force_authenticate(self.owner)
+
+    def test_bulk_accept_reports_per_link_outcome(self):
+        ids = [link.id for link in self.pending] + [self.blocked.id, self.foreign.id]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("bulk-link-status"), {"ids": ids, "status": "linked"}, format="json"
+            )
+        statements = [q["sql"].split()[0] for q in queries.captured_queries]
+        self.assertEqual([s for s in statements if s in ("SELECT", "UPDATE")], ["SELECT", "UPDATE"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], 3)
+        self.assertEqual(
+            [r["outcome"] for r in response.data["results"]],
+            ["updated", "updated", "updated", "blocked", "not_found"]
+        )
+        self.assertEqual(LinkRequest.objects.filter(status="linked").count(), 3)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, "pending")
+
+    def test_bulk_update_invalidates_link_cache(self):
+        consumer = self.pending[0].consumer
+        self.client.post(
+            reverse("bulk-link-status"), {"ids": [self.pending[0].id], "status": "linked"}, format="json"
+        )
+        self.client.force_authenticate(consumer)
+        self.assertEqual(self.client.get(reverse("supplier-catalog", args=[self.owner.id])).status_code, 200)
+
+        self.client.force_authenticate(self.owner)
+        self.client.post(
+            reverse("bulk-link-status"), {"ids": [self.pending[0].id], "status": "blocked"}, format="json"
+        )
+        self.client.force_authenticate(consumer)
+        self.assertEqual(self.client.get(reverse("supplier-catalog", args=[self.owner.id])).status_code, 403)
+
+    def test_sales_cannot_moderate(self):
+        sales = create_user("s@test.com", "sales")
+        self.client.force_authenticate(sales)
+        response = self.client.post(
+            reverse("bulk-link-status"), {"ids": [self.pending[0].id], "status": "linked"}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class LinkListTests(APITestCase):
+
+    def setUp(self):
+        self.owner = create_user("o@test.com", "owner")
+        self.consumer = create_user("c@test.com", "consumer")
+        self.links = [
+            LinkRequest.objects.create(
+                supplier=self.owner,
+                consumer=create_user(f"shop{i}@test.com", "consumer"),
+                status="linked" if i % 2 else "pending",
+            )
+            for i in range(6)
+        ]
+        for i in range(4):
+            LinkRequest.objects.create(
+                supplier=create_user(f"farm{i}@test.com", "owner"), consumer=self.consumer
+            )
+
+    def test_supplier_list_query_count_does_not_grow_with_rows(self):
+        self.client.force_authenticate(self.owner)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("supplier-links"))
+
+        self.assertEqual(len(response.json()), 6)
+        self.assertEqual(response.json()[0]["id"], self.links[-1].id)
+
+    def test_supplier_list_filters_and_pages(self):
+        self.client.force_authenticate(self.owner)
+
+        first = self.client.get(reverse("supplier-links"), {"status": "linked", "page_size": 2}).json()
+        second = self.client.get(first["next"]).json()
+
+        self.assertEqual(
+            [link["consumer_name"] for link in first["results"] + second["results"]],
+            ["shop5", "shop3", "shop1"]
+        )
+        searched = self.client.get(reverse("supplier-links"), {"search": "SHOP4"}).json()
+        self.assertEqual([link["consumer_name"] for link in searched], ["shop4"])
+
+    def test_consumer_list_is_paginated(self):
+        self.client.force_authenticate(self.consumer)
+
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse("consumer-links"), {"page_size": 3}).json()
+
+        self.assertEqual(
+            [link["supplier_name"] for link in data["results"]], ["farm3", "farm2", "farm1"]
+        )
+        self.assertIsNotNone(data["next"])
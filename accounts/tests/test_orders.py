@@ -1,6 +1,10 @@
+import json
+import threading
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
 from django.urls import reverse
-from rest_framework.test import APITestCase
-from accounts.models import User, Product, LinkRequest, CartItem, Order
+from rest_framework.test import APIClient, APITestCase
+from accounts.models import User, Company, Product, LinkRequest, CartItem, Order, OrderItem, IdempotencyKey
 from rest_framework import status
 
 def create_user(email, role, password="Pass123!"):
@@ -38,6 +42,43 @@ class OrderTests(APITestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(Order.objects.count(), 1)
 
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 7)
+        self.assertFalse(CartItem.objects.filter(consumer=self.consumer).exists())
+
+    def test_checkout_rejects_insufficient_stock(self):
+        CartItem.objects.create(consumer=self.consumer, product=self.product, quantity=3)
+        Product.objects.filter(id=self.product.id).update(stock=2)
+
+        response = self.client.post(reverse("checkout"))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Only 2", response.data["detail"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertTrue(CartItem.objects.filter(consumer=self.consumer).exists())
+
+    def test_checkout_splits_cart_per_supplier(self):
+        other = create_user("o2@test.com", "owner")
+        LinkRequest.objects.create(supplier=other, consumer=self.consumer, status="linked")
+        salt = Product.objects.create(supplier=other, name="Salt", price=50, stock=10)
+        CartItem.objects.create(consumer=self.consumer, product=self.product, quantity=2)
+        CartItem.objects.create(consumer=self.consumer, product=salt, quantity=4)
+
+        response = self.client.post(reverse("checkout"))
+
+        self.assertEqual(response.status_code, 201)
+        orders = {order["supplier"]: order for order in response.data["orders"]}
+        self.assertEqual(set(orders), {self.owner.id, other.id})
+        self.assertEqual(float(orders[self.owner.id]["total_price"]), 400)
+        self.assertEqual(float(orders[other.id]["total_price"]), 200)
+        self.assertEqual(orders[other.id]["items"][0]["product_name"], "Salt")
+        self.assertEqual(response.data["id"], response.data["orders"][0]["id"])
+        self.assertEqual(Order.objects.count(), 2)
+        salt.refresh_from_db()
+        self.assertEqual(salt.stock, 6)
+
     class RBACTests(APITestCase):
 
         def test_sales_cannot_approve_order(self):
@@ -76,4 +117,333 @@ class RBACTests(APITestCase):
             reverse("order-accept", args=[order.id])
         )
 
-        self.assertEqual(response.status_code, 403)
\ No newline at end of file
+        self.assertEqual(response.status_code, 403)
+
+class OrderRejectTests(APITestCase):
+
+    def test_reject_restocks_items(self):
+        consumer = create_user("c@test.com", "consumer")
+        owner = create_user("o@test.com", "owner")
+        sugar = Product.objects.create(supplier=owner, name="Sugar", price=200, stock=1)
+        salt = Product.objects.create(supplier=owner, name="Salt", price=50, stock=0)
+        order = Order.objects.create(consumer=consumer, supplier=owner, total_price=500)
+        OrderItem.objects.create(order=order, product=sugar, quantity=2, price=200)
+        OrderItem.objects.create(order=order, product=salt, quantity=2, price=50)
+
+        self.client.force_authenticate(owner)
+        response = self.client.post(reverse("order-reject", args=[order.id]))
+
+        self.assertEqual(response.status_code, 200)
+        sugar.refresh_from_db()
+        salt.refresh_from_db()
+        self.assertEqual((sugar.stock, salt.stock), (3, 2))
+        order.refresh_from_db()
+        self.assertEqual(order.status, "cancelled")
+
+        response = self.client.post(reverse("order-reject", args=[order.id]))
+        self.assertEqual(response.status_code, 400)
+        sugar.refresh_from_db()
+        self.assertEqual(sugar.stock, 3)
+
+
+class OrderListTests(APITestCase):
+
+    def setUp(self):
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        product = Product.objects.create(supplier=self.owner, name="Sugar", price=200, stock=10)
+        for index in range(5):
+            order = Order.objects.create(
+                consumer=self.consumer,
+                supplier=self.owner,
+                total_price=200,
+                status="delivered" if index % 2 else "pending",
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=200)
+        Order.objects.filter(id=order.id).update(created_at="2024-01-15T10:00:00Z")
+
+    def test_supplier_orders_are_paginated_with_constant_queries(self):
+        self.client.force_authenticate(self.owner)
+        seen = []
+        url = reverse("supplier-orders") + "?page_size=2"
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen += [order["id"] for order in response.data["results"]]
+            self.assertEqual(response.data["results"][0]["items"][0]["product_name"], "Sugar")
+            url = response.data["next"]
+
+        self.assertEqual(seen, list(Order.objects.order_by("-created_at", "-id").values_list("id", flat=True)))
+
+    def test_filters_by_status_and_date(self):
+        self.client.force_authenticate(self.consumer)
+
+        response = self.client.get(reverse("my-orders"), {"status": "delivered"})
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.get(reverse("my-orders"), {"from": "2024-01-01", "to": "2024-01-15"})
+        self.assertEqual(len(response.data), 1)
+
+        response = self.client.get(reverse("my-orders"), {"to": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderStatsTests(APITestCase):
+
+    def setUp(self):
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        for created_at, order_status, total in [
+            ("2024-01-10T09:00:00Z", "delivered", 100),
+            ("2024-01-10T18:00:00Z", "pending", 50),
+            ("2024-02-03T12:00:00Z", "delivered", 300),
+            ("2024-03-01T12:00:00Z", "approved", 70),
+        ]:
+            order = Order.objects.create(consumer=self.consumer, supplier=self.owner, total_price=total, status=order_status)
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+
+    def test_supplier_staff_see_company_stats_with_series(self):
+        self.client.force_authenticate(self.owner)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("supplier-order-stats"),
+                {"from": "2024-01-01", "to": "2024-02-28", "granularity": "day"},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["completed_orders"], 2)
+        self.assertEqual(response.data["active_orders"], 1)
+        self.assertEqual(response.data["total_revenue"], 400)
+        self.assertEqual(
+            [(row["period"], row["completed_orders"]) for row in response.data["series"]],
+            [("2024-01-10", 1), ("2024-02-03", 1)],
+        )
+
+        manager = create_user("m@test.com", "manager")
+        manager.company = Company.objects.create(name="Acme", owner=self.owner)
+        manager.save()
+        self.client.force_authenticate(manager)
+        response = self.client.get(reverse("supplier-order-stats"))
+        self.assertEqual(response.data["total_revenue"], 400)
+
+    def test_consumer_stats_totals(self):
+        self.client.force_authenticate(self.consumer)
+        response = self.client.get(reverse("order-stats"))
+
+        self.assertEqual(response.data["completed_orders"], 2)
+        self.assertEqual(response.data["in_progress_orders"], 2)
+        self.assertEqual(response.data["total_spent"], 400)
+        self.assertEqual(len(response.data["series"]), 3)
+
+        response = self.client.get(reverse("order-stats"), {"granularity": "year"})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderExportTests(APITestCase):
+
+    def test_supplier_exports_orders_with_items(self):
+        consumer = create_user("c@test.com", "consumer")
+        owner = create_user("o@test.com", "owner")
+        product = Product.objects.create(supplier=owner, name="Sugar", price=200, stock=10)
+        order = Order.objects.create(consumer=consumer, supplier=owner, total_price=400)
+        OrderItem.objects.create(order=order, product=product, quantity=2, price=200)
+
+        self.client.force_authenticate(owner)
+        response = self.client.get(
+            reverse("supplier-orders-export"), {"file_format": "ndjson"}
+        )
+
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["items"][0]["product_name"], "Sugar")
+
+        response = self.client.get(reverse("supplier-orders-export"))
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("Sugar", lines[1])
+
+    def test_csv_export_keeps_orders_without_items(self):
+        consumer = create_user("c@test.com", "consumer")
+        owner = create_user("o@test.com", "owner")
+        order = Order.objects.create(consumer=consumer, supplier=owner, total_price=0)
+
+        self.client.force_authenticate(owner)
+        response = self.client.get(reverse("supplier-orders-export"))
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f"{order.id},"))
+        self.assertTrue(lines[1].endswith(",,,,,"))
+
+
+class IdempotencyTests(APITestCase):
+
+    def setUp(self):
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        LinkRequest.objects.create(supplier=self.owner, consumer=self.consumer, status="linked")
+        self.product = Product.objects.create(supplier=self.owner, name="Sugar", price=200, stock=10)
+        self.client.force_authenticate(self.consumer)
+
+    def test_retried_checkout_replays_first_response_byte_for_byte(self):
+        CartItem.objects.create(consumer=self.consumer, product=self.product, quantity=2)
+
+        first = self.client.post(reverse("checkout"), HTTP_IDEMPOTENCY_KEY="abc")
+        retry = self.client.post(reverse("checkout"), HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(retry["Content-Type"], first["Content-Type"])
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 8)
+
+    def test_replayed_cart_line_keeps_number_formatting(self):
+        url = reverse("cart-add")
+        data = {"product_id": self.product.id, "quantity": 1}
+        first = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY="abc")
+        retry = self.client.post(url, data, HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(retry.content, first.content)
+        self.assertEqual(retry.json()["line_total"], first.json()["line_total"])
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        url = reverse("cart-add")
+        self.client.post(url, {"product_id": self.product.id, "quantity": 1}, HTTP_IDEMPOTENCY_KEY="abc")
+
+        response = self.client.post(
+            url, {"product_id": self.product.id, "quantity": 5}, HTTP_IDEMPOTENCY_KEY="abc"
+        )
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(CartItem.objects.get(consumer=self.consumer).quantity, 1)
+
+    def test_fingerprint_mismatch_returns_422(self):
+        CartItem.objects.create(consumer=self.consumer, product=self.product, quantity=2)
+        IdempotencyKey.objects.create(user=self.consumer, key="abc", fingerprint="-")
+
+        response = self.client.post(reverse("checkout"), HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 0)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_in_flight_key_is_not_run_twice(self):
+        CartItem.objects.create(consumer=self.consumer, product=self.product, quantity=2)
+        self.client.post(reverse("checkout"), HTTP_IDEMPOTENCY_KEY="abc")
+        IdempotencyKey.objects.filter(key="abc").update(status="in_progress")
+        response = self.client.post(reverse("checkout"), HTTP_IDEMPOTENCY_KEY="abc")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentCheckoutTests(TransactionTestCase):
+
+    def test_parallel_checkouts_do_not_oversell(self):
+        owner = create_user("o@test.com", "owner")
+        product = Product.objects.create(supplier=owner, name="Sugar", price=200, stock=5)
+        consumers = [create_user(f"c{i}@test.com", "consumer") for i in range(12)]
+        for consumer in consumers:
+            LinkRequest.objects.create(supplier=owner, consumer=consumer, status="linked")
+            CartItem.objects.create(consumer=consumer, product=product, quantity=1)
+
+        statuses = []
+        barrier = threading.Barrier(len(consumers))
+
+        def checkout(consumer):
+            client = APIClient()
+            client.force_authenticate(consumer)
+            barrier.wait()
+            try:
+                statuses.append(client.post(reverse("checkout")).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(c,)) for c in consumers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 0)
+        self.assertEqual(statuses.count(201), 5)
+        self.assertEqual(statuses.count(400), 7)
+        self.assertEqual(Order.objects.count(), 5)
+
+    def test_parallel_submits_from_one_consumer_create_one_order(self):
+        owner = create_user("o@test.com", "owner")
+        consumer = create_user("c@test.com", "consumer")
+        LinkRequest.objects.create(supplier=owner, consumer=consumer, status="linked")
+        product = Product.objects.create(supplier=owner, name="Sugar", price=200, stock=10)
+        CartItem.objects.create(consumer=consumer, product=product, quantity=2)
+
+        statuses = []
+        barrier = threading.Barrier(4)
+
+        def checkout():
+            client = APIClient()
+            client.force_authenticate(consumer)
+            barrier.wait()
+            try:
+                statuses.append(client.post(reverse("checkout")).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock, 8)
+        self.assertEqual(sorted(statuses), [201, 400, 400, 400])
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_cart_edit_during_checkout_is_not_lost(self):
+        owner = create_user("o@test.com", "owner")
+        consumer = create_user("c@test.com", "consumer")
+        LinkRequest.objects.create(supplier=owner, consumer=consumer, status="linked")
+        product = Product.objects.create(supplier=owner, name="Sugar", price=200, stock=10)
+        item = CartItem.objects.create(consumer=consumer, product=product, quantity=2)
+
+        responses = {}
+        barrier = threading.Barrier(2)
+
+        def run(name, request):
+            client = APIClient()
+            client.force_authenticate(consumer)
+            barrier.wait()
+            try:
+                responses[name] = request(client)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=("checkout", lambda c: c.post(reverse("checkout")))),
+            threading.Thread(
+                target=run,
+                args=("edit", lambda c: c.patch(reverse("cart-item", args=[item.id]), {"quantity": 3})),
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(responses["checkout"].status_code, 201)
+        ordered = OrderItem.objects.get().quantity
+        in_cart = list(CartItem.objects.filter(consumer=consumer).values_list("quantity", flat=True))
+        if responses["edit"].status_code == 404:
+            # the line was already checked out when the edit looked for it
+            self.assertEqual((ordered, in_cart), (2, []))
+        else:
+            # the edit either made it into the order or is still in the cart
+            self.assertEqual(responses["edit"].status_code, 200)
+            self.assertIn((ordered, in_cart), [(3, []), (2, [3])])
@@ -1,6 +1,21 @@
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from io import StringIO
+from unittest import mock
+import io
+import json
+import shutil
+import tempfile
+import threading
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
+from PIL import Image
 from rest_framework.test import APITestCase
-from accounts.models import User, Product, LinkRequest, CartItem, Order
+from accounts.images import ImageSourceError, generate_variants
+from accounts.imports import ProductImporter
+from accounts.models import User, Product, LinkRequest, CartItem, Order, ProductImageAttempt, ProductImageVariant
 from rest_framework import status
 
 def create_user(email, role, password="Pass123!"):
@@ -38,3 +53,281 @@ class ProductTests(APITestCase):
             "price": "80"
         })
         self.assertEqual(response.status_code, 403)
+
+
+class ProductImportTests(APITestCase):
+
+    def setUp(self):
+        self.owner = create_user("owner@test.com", "owner")
+        self.client.force_authenticate(self.owner)
+        Product.objects.create(
+            supplier=self.owner, sku="MILK-1", name="Milk", price=100, stock=1
+        )
+
+    def test_csv_import_upserts_by_sku_and_reports_bad_rows(self):
+        upload = SimpleUploadedFile(
+            "products.csv",
+            b"sku,name,price,stock,category\n"
+            b"MILK-1,Milk 3.2%,120,40,Dairy\n"
+            b"BREAD-1,Bread,50,10,\n"
+            b"BAD-1,Broken,not-a-price,1,Dairy\n",
+        )
+
+        response = self.client.post(reverse("product-import"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 3)
+        self.assertIn("price", response.data["errors"][0]["errors"])
+
+        milk = Product.objects.get(supplier=self.owner, sku="MILK-1")
+        self.assertEqual(milk.name, "Milk 3.2%")
+        self.assertEqual(milk.stock, 40)
+        self.assertEqual(Product.objects.get(sku="BREAD-1").category, "Uncategorized")
+
+    def test_jsonl_import(self):
+        upload = SimpleUploadedFile(
+            "products.jsonl",
+            b'{"sku": "TEA-1", "name": "Tea", "price": "30", "stock": 5}\n'
+            b'not json\n',
+        )
+
+        response = self.client.post(reverse("product-import"), {"file": upload})
+
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertTrue(Product.objects.filter(sku="TEA-1").exists())
+
+    def test_non_utf8_file_is_reported_not_crashed(self):
+        upload = SimpleUploadedFile(
+            "products.csv", "sku,name,price\nKEFIR-1,Кефир,80\n".encode("cp1251")
+        )
+
+        response = self.client.post(reverse("product-import"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 0)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertIn("UTF-8", response.data["errors"][0]["errors"]["non_field_errors"][0])
+
+    def test_sku_created_concurrently_is_updated(self):
+        upload = SimpleUploadedFile("products.csv", b"sku,name,price\nMILK-1,Milk 3.2%,120\n")
+        lookup = ProductImporter.existing_products
+        calls = []
+
+        def first_lookup_misses(importer, skus):
+            # as if another import created MILK-1 right after the first lookup
+            calls.append(skus)
+            return {} if len(calls) == 1 else lookup(importer, skus)
+
+        with mock.patch.object(ProductImporter, "existing_products", first_lookup_misses):
+            response = self.client.post(reverse("product-import"), {"file": upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["updated"]), (0, 1))
+        self.assertEqual(Product.objects.get(sku="MILK-1").name, "Milk 3.2%")
+
+    def test_sales_cannot_import(self):
+        sales = create_user("sales@test.com", "sales")
+        self.client.force_authenticate(sales)
+        upload = SimpleUploadedFile("products.csv", b"sku,name,price\nA,B,1\n")
+
+        response = self.client.post(reverse("product-import"), {"file": upload})
+
+        self.assertEqual(response.status_code, 403)
+
+
+class ProductExportTests(APITestCase):
+
+    def setUp(self):
+        self.owner = create_user("owner@test.com", "owner")
+        self.client.force_authenticate(self.owner)
+        Product.objects.create(supplier=self.owner, sku="A-1", name="Apples", price=100)
+        Product.objects.create(supplier=self.owner, sku="B-1", name="Bread", price=50)
+
+    def test_csv_export_streams_all_products(self):
+        response = self.client.get(reverse("product-export"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("id,sku,name"))
+        self.assertEqual(len(lines), 3)
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse("product-export"), {"file_format": "ndjson"})
+
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["Apples", "Bread"])
+
+
+class BulkPriceUpdateTests(APITestCase):
+
+    def setUp(self):
+        self.owner = create_user("owner@test.com", "owner")
+        self.client.force_authenticate(self.owner)
+        self.milk = Product.objects.create(
+            supplier=self.owner, name="Milk", category="Dairy", price=100, discount=95
+        )
+        self.cheese = Product.objects.create(
+            supplier=self.owner, name="Cheese", category="Dairy", price="250.50"
+        )
+        self.bread = Product.objects.create(
+            supplier=self.owner, name="Bread", category="Bakery", price=50
+        )
+
+    def test_percentage_price_change_by_category(self):
+        response = self.client.post(reverse("product-bulk-price"), {
+            "field": "price", "mode": "percent", "value": "-10", "category": "Dairy"
+        }, format="json")
+
+        self.assertEqual(response.data["updated"], 2)
+        for product in (self.milk, self.cheese, self.bread):
+            product.refresh_from_db()
+        self.assertEqual(self.milk.price, Decimal("90.00"))
+        self.assertEqual(self.cheese.price, Decimal("225.45"))
+        self.assertEqual(self.bread.price, Decimal("50.00"))
+        self.assertEqual(self.milk.effective_price, Decimal("4.50"))
+        self.assertEqual(self.cheese.effective_price, Decimal("225.45"))
+
+    def test_absolute_discount_is_clamped(self):
+        response = self.client.post(reverse("product-bulk-price"), {
+            "field": "discount", "mode": "absolute", "value": "10",
+            "ids": [self.milk.id, self.bread.id]
+        }, format="json")
+
+        self.assertEqual(response.data["updated"], 2)
+        self.milk.refresh_from_db()
+        self.bread.refresh_from_db()
+        self.assertEqual(self.milk.discount, Decimal("100"))
+        self.assertEqual(self.bread.discount, Decimal("10"))
+        self.assertEqual(self.milk.effective_price, Decimal("0.00"))
+        self.assertEqual(self.bread.effective_price, Decimal("45.00"))
+
+    def test_change_past_the_price_column_is_rejected(self):
+        for mode, value in (("percent", "99999999"), ("absolute", "99999999.99")):
+            response = self.client.post(reverse("product-bulk-price"), {
+                "field": "price", "mode": mode, "value": value, "category": "Dairy"
+            }, format="json")
+
+            self.assertEqual(response.status_code, 400, mode)
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.price, Decimal("250.50"))
+
+
+class ProductImageTests(APITestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = create_user("owner@test.com", "owner")
+        self.consumer = create_user("consumer@test.com", "consumer")
+        LinkRequest.objects.create(supplier=self.owner, consumer=self.consumer, status="linked")
+        self.product = Product.objects.create(supplier=self.owner, name="Milk", price=100)
+
+    def upload(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(buffer, "PNG")
+        self.client.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("product-image-upload", args=[self.product.id]),
+                {"file": SimpleUploadedFile("milk.png", buffer.getvalue(), "image/png")},
+                format="multipart",
+            )
+
+    def test_upload_defers_variants_to_command_without_queue(self):
+        response = self.upload()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ProductImageVariant.objects.exists())
+
+        call_command("generate_image_variants", stdout=StringIO())
+        thumb = ProductImageVariant.objects.get(product=self.product, name="thumb", format="webp")
+        self.assertEqual((thumb.width, thumb.height), (160, 107))
+        self.assertEqual(ProductImageVariant.objects.filter(product=self.product).count(), 4)
+
+        self.client.force_authenticate(self.consumer)
+        catalog = self.client.get(reverse("supplier-catalog", args=[self.owner.id])).json()
+        self.assertEqual(
+            set(catalog[0]["image_variants"]["thumb"]), {"webp", "jpeg"}
+        )
+
+    def test_invalid_image_is_rejected(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(
+            reverse("product-image-upload", args=[self.product.id]),
+            {"file": SimpleUploadedFile("milk.png", b"not an image", "image/png")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ProductImageVariant.objects.exists())
+
+    def test_command_skips_products_already_attempted(self):
+        self.upload()
+        call_command("generate_image_variants", stdout=StringIO())
+        out = StringIO()
+        call_command("generate_image_variants", stdout=out)
+
+        self.assertIn("for 0 products", out.getvalue())
+
+    def test_private_address_is_not_fetched(self):
+        requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                requests.append(self.path)
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f"http://127.0.0.1:{server.server_port}/milk.png"
+        Product.objects.filter(id=self.product.id).update(image=url)
+
+        with self.assertLogs("accounts.images", "WARNING"):
+            generate_variants(self.product.id)
+
+        self.assertEqual(requests, [])
+        self.assertFalse(ProductImageVariant.objects.exists())
+        attempt = ProductImageAttempt.objects.get(product=self.product)
+        self.assertEqual((attempt.source, attempt.succeeded), (url, False))
+
+    def test_failed_source_is_not_refetched_on_save(self):
+        self.product.image = "https://images.example.com/milk.png"
+        with mock.patch("accounts.signals.schedule_variants") as schedule:
+            self.product.save()
+            with mock.patch("accounts.images.read_source", side_effect=ImageSourceError("timed out")), \
+                    self.assertLogs("accounts.images", "WARNING"):
+                generate_variants(self.product.id)
+
+            self.product.name = "Whole milk"
+            self.product.save()
+            self.assertEqual(schedule.call_count, 1)
+
+            self.product.image = "https://images.example.com/whole-milk.png"
+            self.product.save()
+            self.assertEqual(schedule.call_count, 2)
+
+    def test_command_retries_failed_sources_on_request(self):
+        Product.objects.filter(id=self.product.id).update(image="https://images.example.com/milk.png")
+        with mock.patch("accounts.images.read_source", side_effect=ImageSourceError("timed out")) as read, \
+                self.assertLogs("accounts.images", "WARNING"):
+            call_command("generate_image_variants", stdout=StringIO())
+            call_command("generate_image_variants", stdout=StringIO())
+            self.assertEqual(read.call_count, 1)
+
+            call_command("generate_image_variants", "--retry-failed", stdout=StringIO())
+            self.assertEqual(read.call_count, 2)
@@ -0,0 +1,96 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from accounts.models import User, Product, LinkRequest
+
+
+def create_user(email, role, password="Pass123!"):
+    return User.objects.create_user(
+        email=email,
+        password=password,
+        full_name=email.split("@")[0],
+        role=role
+    )
+
+class SearchTests(APITestCase):
+
+    def setUp(self):
+        self.consumer = create_user("c@test.com", "consumer")
+        self.owner = create_user("o@test.com", "owner")
+        self.other_owner = create_user("other@test.com", "owner")
+        LinkRequest.objects.create(
+            supplier=self.owner, consumer=self.consumer, status="linked"
+        )
+        self.client.force_authenticate(self.consumer)
+
+    def search(self, query, **params):
+        return self.client.get(reverse("global-search"), {"q": query, **params}).json()
+
+    def test_name_match_ranks_above_description_match(self):
+        Product.objects.create(
+            supplier=self.owner, name="Bread", price=50, description="goes well with milk"
+        )
+        Product.objects.create(supplier=self.owner, name="Milk premium", price=100)
+        Product.objects.create(supplier=self.other_owner, name="Milk", price=100)
+
+        data = self.search("milk")
+
+        self.assertEqual([p["name"] for p in data["products"]], ["Milk premium", "Bread"])
+        self.assertEqual(data["products_total"], 2)
+
+    def test_index_follows_product_updates_and_deletes(self):
+        product = Product.objects.create(supplier=self.owner, name="Sugar", price=100)
+        self.assertEqual(len(self.search("suga")["products"]), 1)
+
+        product.name = "Salt"
+        product.save()
+        self.assertEqual(self.search("sugar")["products"], [])
+        self.assertEqual(len(self.search("salt")["products"]), 1)
+
+        product.delete()
+        self.assertEqual(self.search("salt")["products"], [])
+
+    def test_price_and_stock_edits_do_not_reindex(self):
+        Product.objects.create(supplier=self.owner, name="Sugar", price=100)
+        product = Product.objects.get(name="Sugar")
+
+        product.price = 120
+        product.stock = 7
+        # the UPDATE only: no search document, image or supplier queries
+        with self.assertNumQueries(1):
+            product.save()
+
+        product.description = "cane sugar"
+        product.save(update_fields=["description"])
+        self.assertEqual(len(self.search("cane")["products"]), 1)
+
+    def test_results_are_paginated(self):
+        for i in range(5):
+            Product.objects.create(supplier=self.owner, name=f"Tea {i}", price=100)
+
+        first = self.search("tea", page_size=2)
+        last = self.search("tea", page_size=2, page=3)
+
+        self.assertEqual(len(first["products"]), 2)
+        self.assertEqual(len(last["products"]), 1)
+        self.assertEqual(first["products_total"], 5)
+
+    def test_typo_falls_back_to_fuzzy_match(self):
+        Product.objects.create(supplier=self.owner, name="Milk premium", price=100)
+        Product.objects.create(supplier=self.owner, name="Mango", price=100)
+        Product.objects.create(supplier=self.owner, name="Bread", price=50)
+        Product.objects.create(supplier=self.other_owner, name="Milk", price=100)
+
+        data = self.search("mlik")
+
+        self.assertTrue(data["fuzzy"])
+        self.assertEqual(data["products"][0]["name"], "Milk premium")
+        self.assertNotIn("Bread", [p["name"] for p in data["products"]])
+        self.assertEqual(len([p for p in data["products"] if p["name"] == "Milk"]), 0)
+
+    def test_supplier_name_typo(self):
+        self.owner.full_name = "Golden Dairy"
+        self.owner.save()
+
+        data = self.search("dairu")
+
+        self.assertEqual([s["id"] for s in data["suppliers"]], [self.owner.id])
@@ -6,10 +6,15 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path("products/", SupplierProductListCreateView.as_view(), name="product-list-create"),
+    path("products/import/", ProductImportView.as_view(), name="product-import"),
+    path("products/export/", ProductExportView.as_view(), name="product-export"),
+    path("products/bulk-price/", BulkPriceUpdateView.as_view(), name="product-bulk-price"),
     path("products/<int:pk>/", SupplierProductDetailView.as_view(), name="product-detail"),
+    path("products/<int:pk>/image/", ProductImageUploadView.as_view(), name="product-image-upload"),
     path("products/<int:pk>/status/", ProductStatusToggleView.as_view(), name="product-status-toggle"),
     path("link/send/", SendLinkRequestView.as_view(), name="send-link"),
-    path("links/", SupplierLinkListView.as_view()),
+    path("links/", SupplierLinkListView.as_view(), name="supplier-links"),
+    path("link/bulk/", BulkLinkStatusView.as_view(), name="bulk-link-status"),
     path("link/<int:link_id>/", UnlinkView.as_view()),
     path("link/<int:link_id>/accept/", AcceptLinkView.as_view(), name="accept-link"),
     path("link/<int:link_id>/reject/", RejectLinkView.as_view(), name="reject-link"),
@@ -19,12 +24,16 @@ urlpatterns = [
     path("suppliers/", AllSuppliersView.as_view(), name="all-suppliers"),
     path("consumer/links/", ConsumerLinkListView.as_view(), name="consumer-links"),
     path("supplier/<int:supplier_id>/catalog/", SupplierCatalogView.as_view(), name="supplier-catalog"),
+    path("supplier/<int:supplier_id>/catalog/sync/", SupplierCatalogSyncView.as_view(), name="supplier-catalog-sync"),
     path("cart/add/", CartAddView.as_view(), name="cart-add"),
     path("cart/", CartListView.as_view(), name="cart-list"),
+    path("cart/batch/", CartBatchView.as_view(), name="cart-batch"),
+    path("cart/summary/", CartSummaryView.as_view(), name="cart-summary"),
     path("cart/<int:item_id>/", CartItemUpdateDeleteView.as_view(), name="cart-item"),
     path("orders/checkout/", CheckoutView.as_view(), name="checkout"),
     path("orders/my/", MyOrdersView.as_view(), name="my-orders"),
     path("orders/supplier/", SupplierOrdersView.as_view(), name="supplier-orders"),
+    path("orders/supplier/export/", SupplierOrderExportView.as_view(), name="supplier-orders-export"),
     path("chat/<int:partner_id>/", ChatHistoryView.as_view(), name="chat-history"),
     path("chat/<int:supplier_id>/send/", SendMessageView.as_view(), name="chat-send"),
     path("orders/<int:order_id>/accept/", SupplierAcceptOrderView.as_view(), name="order-accept"),
@@ -1,12 +1,19 @@
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction
-from django.db.models import Q, Sum
+from django.db import DataError, transaction
+from django.db.models import DecimalField, F, Prefetch, Value
+from django.db.models.functions import Greatest, Least, Round
 from django.utils import timezone
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import MultiPartParser
+from django.conf import settings
 
 from .models import (
     User,
@@ -19,6 +26,7 @@ from .models import (
     Message,
     Complaint,
     CannedReply,
+    effective_price_expression,
 )
 from .serializers import (
     RegisterSerializer,
@@ -26,6 +34,10 @@ from .serializers import (
     ProductSerializer,
     LinkRequestSerializer,
     SupplierSerializer,
+    BulkLinkStatusSerializer,
+    BulkPriceUpdateSerializer,
+    ProductImageUploadSerializer,
+    CartBatchSerializer,
     CartItemSerializer,
     OrderSerializer,
     MessageSerializer,
@@ -33,9 +45,40 @@ from .serializers import (
     UserSerializer,
     CannedReplySerializer,
 )
+from .auth import ClaimsRefreshToken, get_company_owner, mark_membership_changed
+from .cache import bump_catalog_version, get_cached_catalog
+from .cart import get_cart_summary
+from .filters import (
+    apply_catalog_filters,
+    apply_link_filters,
+    apply_order_filters,
+    catalog_cache_params,
+    catalog_facets,
+    catalog_ordering,
+)
+from .exports import EXPORT_FORMATS, export_orders, export_products
+from .idempotency import idempotent
+from .imports import IMPORT_FORMATS, detect_format, import_products
+from .inventory import (
+    CartOperationError,
+    InsufficientStock,
+    apply_cart_operations,
+    decrement_stock,
+    lock_consumer,
+    reserve_cart_item,
+    restock_orders,
+)
+from .links import bulk_set_link_status, get_linked_supplier_ids, is_linked
+from .pagination import CatalogPagination, LinkPagination, OrderPagination
+from .search import fuzzy_search_products, fuzzy_search_suppliers, search_products
+from .stats import consumer_metrics, order_stats, supplier_metrics
+from .sync import catalog_changes, parse_watermark
 
 SUPPLIER_ROLES = ["owner", "manager", "sales"]
 
+# largest value Product.price (max_digits=10, decimal_places=2) can hold
+MAX_PRICE = Decimal("99999999.99")
+
 
 def is_supplier_side(user: User) -> bool:
     return user.role in SUPPLIER_ROLES
@@ -45,21 +88,12 @@ def is_catalog_manager(user: User) -> bool:
     return user.role in ["owner", "manager"]
 
 
-def get_company_owner(user: User) -> User:
-    if user.role == "owner":
-        return user
-    elif user.company and user.company.owner:
-        return user.company.owner
-    return user
-
-
 class RegisterView(APIView):
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            from rest_framework_simplejwt.tokens import RefreshToken
-            refresh = RefreshToken.for_user(user)
+            refresh = ClaimsRefreshToken.for_user(user)
             return Response(
                 {
                     "message": "User registered successfully",
@@ -90,7 +124,11 @@ class SupplierProductListCreateView(generics.ListCreateAPIView):
         if not is_catalog_manager(user):
             return Product.objects.none()
         company_owner = get_company_owner(user)
-        return Product.objects.filter(supplier=company_owner)
+        return (
+            Product.objects.filter(supplier=company_owner)
+            .select_related("supplier")
+            .prefetch_related("image_variants")
+        )
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -109,7 +147,160 @@ class SupplierProductDetailView(generics.RetrieveUpdateDestroyAPIView):
         if not is_catalog_manager(user):
             return Product.objects.none()
         company_owner = get_company_owner(user)
-        return Product.objects.filter(supplier=company_owner)
+        return (
+            Product.objects.filter(supplier=company_owner)
+            .select_related("supplier")
+            .prefetch_related("image_variants")
+        )
+
+
+class ProductImportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        user = request.user
+        if not is_catalog_manager(user):
+            return Response(
+                {"detail": "Only Owner/Manager can import products"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response(
+                {"detail": "file is required"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_format = request.data.get("file_format") or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response(
+                {"detail": "file_format must be csv or jsonl"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        report = import_products(get_company_owner(user), upload, file_format)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+def streaming_export(rows, file_format, filename):
+    response = StreamingHttpResponse(rows, content_type=EXPORT_FORMATS[file_format])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+class ProductExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not is_catalog_manager(request.user):
+            return Response(
+                {"detail": "Only Owner/Manager can export products"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        file_format = request.GET.get("file_format", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": "file_format must be csv or ndjson"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        company_owner = get_company_owner(request.user)
+        return streaming_export(
+            export_products(company_owner, file_format), file_format, "products"
+        )
+
+
+class BulkPriceUpdateView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if not is_catalog_manager(request.user):
+            return Response(
+                {"detail": "Only Owner/Manager can change prices"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        serializer = BulkPriceUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        company_owner = get_company_owner(request.user)
+        products = Product.objects.filter(supplier=company_owner)
+        if "category" in data:
+            products = products.filter(category=data["category"])
+        if "status" in data:
+            products = products.filter(status=data["status"])
+        if "ids" in data:
+            products = products.filter(id__in=data["ids"])
+
+        # one UPDATE ... SET field = field * x (or + x), clamped and rounded in SQL
+        field = data["field"]
+        output = DecimalField(max_digits=10, decimal_places=2)
+        if data["mode"] == "percent":
+            factor = 1 + data["value"] / 100
+            new_value = F(field) * Value(factor, output_field=output)
+        else:
+            new_value = F(field) + Value(data["value"], output_field=output)
+        new_value = Greatest(new_value, Value(Decimal("0"), output_field=output))
+        if field == "discount":
+            new_value = Least(new_value, Value(Decimal("100"), output_field=output))
+        new_value = Round(new_value, 2, output_field=output)
+
+        too_high = Response(
+            {"detail": f"The change would raise some prices above {MAX_PRICE}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+        if field == "price" and products.alias(new_price=new_value).filter(new_price__gt=MAX_PRICE).exists():
+            return too_high
+
+        # the UPDATE sees the old column values, so effective_price is computed
+        # from the new expression rather than from the column being changed
+        try:
+            with transaction.atomic():
+                updated = products.update(
+                    **{
+                        field: new_value,
+                        "effective_price": effective_price_expression(**{field: new_value}),
+                        "updated_at": timezone.now(),
+                    }
+                )
+        except DataError:
+            # a price edited past the check above overflowed the column
+            return too_high
+        if updated:
+            bump_catalog_version(company_owner.id)
+
+        return Response({"updated": updated}, status=status.HTTP_200_OK)
+
+
+class ProductImageUploadView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, pk):
+        user = request.user
+        if not is_catalog_manager(user):
+            return Response(
+                {"detail": "Only Owner/Manager can upload product images"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        product = get_object_or_404(Product, id=pk, supplier=get_company_owner(user))
+
+        serializer = ProductImageUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # variants are generated from image_file after commit (see signals)
+        old_file = product.image_file.name if product.image_file else None
+        upload = serializer.validated_data["file"]
+        product.image_file.save(upload.name, upload, save=False)
+        product.image = request.build_absolute_uri(product.image_file.url)
+        product.save()
+        if old_file:
+            product.image_file.storage.delete(old_file)
+
+        return Response(ProductSerializer(product).data, status=status.HTTP_200_OK)
 
 
 class ProductStatusToggleView(APIView):
@@ -174,16 +365,21 @@ class SendLinkRequestView(APIView):
 class SupplierLinkListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = LinkRequestSerializer
+    pagination_class = LinkPagination
 
     def get_queryset(self):
         user = self.request.user
         if not is_supplier_side(user):
             return LinkRequest.objects.none()
         company_owner = get_company_owner(user)
-        queryset = LinkRequest.objects.filter(supplier=company_owner)
+        queryset = apply_link_filters(
+            LinkRequest.objects.filter(supplier=company_owner),
+            self.request.query_params,
+            "consumer__full_name",
+        )
         if user.role == "sales":
-            return queryset.filter(status="linked")
-        return queryset
+            queryset = queryset.filter(status="linked")
+        return queryset.select_related("consumer", "supplier").order_by("-created_at", "-id")
 
 
 class UnlinkView(APIView):
@@ -272,6 +468,35 @@ class UnblockLinkView(APIView):
         return Response({"detail": "Unblocked"}, status=200)
 
 
+class BulkLinkStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if not is_supplier_side(request.user):
+            return Response({"detail": "Only supplier staff can manage links"}, status=403)
+        if request.user.role == "sales":
+            return Response({"detail": "Sales representatives cannot manage links"}, status=403)
+
+        serializer = BulkLinkStatusSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+        link_ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+
+        company_owner = get_company_owner(request.user)
+        outcomes = bulk_set_link_status(
+            company_owner.id, link_ids, serializer.validated_data["status"]
+        )
+        return Response(
+            {
+                "updated": sum(outcome == "updated" for outcome in outcomes.values()),
+                "results": [
+                    {"id": link_id, "outcome": outcomes[link_id]} for link_id in link_ids
+                ],
+            },
+            status=200,
+        )
+
+
 class AllSuppliersView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -289,44 +514,98 @@ class AllSuppliersView(APIView):
 class ConsumerLinkListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = LinkRequestSerializer
+    pagination_class = LinkPagination
 
     def get_queryset(self):
-        return LinkRequest.objects.filter(consumer=self.request.user)
+        queryset = apply_link_filters(
+            LinkRequest.objects.filter(consumer=self.request.user),
+            self.request.query_params,
+            "supplier__full_name",
+        )
+        return queryset.select_related("consumer", "supplier").order_by("-created_at", "-id")
+
+
+def catalog_access_error(request, supplier_id):
+    # links only ever point at owners, so a linked supplier needs no lookup
+    if is_linked(request.user.id, supplier_id, request):
+        return None
+
+    supplier = get_object_or_404(User, id=supplier_id)
+
+    if supplier.role != "owner":
+        return Response(
+            {"detail": "Only owners can have catalogs"}, status=403
+        )
+
+    return Response(
+        {"detail": "You are not linked with this supplier"}, status=403
+    )
 
 
 class SupplierCatalogView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, supplier_id):
-        supplier = get_object_or_404(User, id=supplier_id)
+        error = catalog_access_error(request, supplier_id)
+        if error:
+            return error
 
-        if supplier.role != "owner":
-            return Response(
-                {"detail": "Only owners can have catalogs"}, status=403
+        params = catalog_cache_params(request.query_params)
+        base_url = request.build_absolute_uri(request.path)
+
+        def build():
+            products = apply_catalog_filters(
+                Product.objects.filter(supplier_id=supplier_id, status="active"),
+                params,
+            )
+            facets = None
+            if "facets" in params:
+                facets = catalog_facets(products)
+            ordering = catalog_ordering(params)
+            products = (
+                products.select_related("supplier")
+                .prefetch_related("image_variants")
+                .order_by(*ordering)
             )
 
-        link = LinkRequest.objects.filter(
-            supplier_id=supplier_id,
-            consumer=request.user,
-            status="linked",
-        ).first()
+            paginator = CatalogPagination()
+            paginator.ordering = ordering
+            page = paginator.paginate_queryset(products, request, view=self)
+            if page is not None:
+                # links carry the canonical params, like the cache key
+                paginator.base_url = f"{base_url}?{urlencode(params)}"
+                serializer = ProductSerializer(page, many=True)
+                data = paginator.get_paginated_response(serializer.data).data
+            else:
+                data = list(ProductSerializer(products, many=True).data)
+                if facets is not None:
+                    data = {"results": data}
+
+            if facets is not None:
+                data["facets"] = facets
+            return data
+
+        variant = f"{base_url}?{urlencode(sorted(params.items()))}"
+        data = get_cached_catalog(supplier_id, variant, build)
+        return Response(data, status=200)
+
+
+class SupplierCatalogSyncView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        if not link:
-            return Response(
-                {"detail": "You are not linked with this supplier"}, status=403
-            )
+    def get(self, request, supplier_id):
+        error = catalog_access_error(request, supplier_id)
+        if error:
+            return error
 
-        products = (
-            Product.objects.filter(supplier_id=supplier_id, status="active")
-            .order_by("name")
-        )
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data, status=200)
+        since = parse_watermark(request.query_params.get("since"))
+        return Response(catalog_changes(supplier_id, since), status=200)
 
 
 class CartAddView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         if request.user.role != "consumer":
             return Response(
@@ -346,12 +625,7 @@ class CartAddView(APIView):
 
         product = get_object_or_404(Product, id=product_id, status="active")
 
-        linked = LinkRequest.objects.filter(
-            consumer=request.user,
-            supplier=product.supplier,
-            status="linked",
-        ).exists()
-        if not linked:
+        if not is_linked(request.user.id, product.supplier_id, request):
             return Response(
                 {"detail": "You must be linked with this supplier"}, status=403
             )
@@ -364,31 +638,27 @@ class CartAddView(APIView):
                 status=400,
             )
 
-        if quantity > product.stock:
+        try:
+            item = reserve_cart_item(request.user, product, quantity, add=True)
+        except InsufficientStock as exc:
             return Response(
-                {"detail": f"Only {product.stock} {product.unit} available"},
+                {"detail": f"Only {exc.available} {product.unit} available"},
                 status=400,
             )
 
-        item, created = CartItem.objects.get_or_create(
-            consumer=request.user,
-            product=product,
-            defaults={"quantity": quantity},
-        )
-        if not created:
-            new_quantity = item.quantity + quantity
-            if new_quantity > product.stock:
-                return Response(
-                    {"detail": f"Only {product.stock} {product.unit} available"},
-                    status=400,
-                )
-            item.quantity = new_quantity
-            item.save()
-
         serializer = CartItemSerializer(item)
         return Response(serializer.data, status=201)
 
 
+def consumer_cart(consumer):
+    return (
+        CartItem.objects.filter(consumer=consumer)
+        .select_related("product", "product__supplier", "reservation")
+        .prefetch_related("product__image_variants")
+        .order_by("-added_at")
+    )
+
+
 class CartListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CartItemSerializer
@@ -396,11 +666,47 @@ class CartListView(generics.ListAPIView):
     def get_queryset(self):
         if self.request.user.role != "consumer":
             return CartItem.objects.none()
-        return (
-            CartItem.objects.filter(consumer=self.request.user)
-            .select_related("product", "product__supplier")
-            .order_by("-added_at")
-        )
+        return consumer_cart(self.request.user)
+
+
+class CartSummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != "consumer":
+            return Response(
+                {"detail": "Only consumers can use cart"}, status=403
+            )
+        return Response(get_cart_summary(request.user.id), status=200)
+
+
+class CartBatchView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @idempotent
+    def post(self, request):
+        if request.user.role != "consumer":
+            return Response(
+                {"detail": "Only consumers can use cart"}, status=403
+            )
+
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        try:
+            apply_cart_operations(
+                request.user,
+                serializer.validated_data["operations"],
+                get_linked_supplier_ids(request.user.id, request),
+            )
+        except CartOperationError as exc:
+            return Response(
+                {"detail": "Cart was not changed", "errors": exc.errors}, status=400
+            )
+
+        serializer = CartItemSerializer(consumer_cart(request.user), many=True)
+        return Response(serializer.data, status=200)
 
 
 class CartItemUpdateDeleteView(APIView):
@@ -429,14 +735,14 @@ class CartItemUpdateDeleteView(APIView):
                 status=400,
             )
 
-        if quantity > product.stock:
+        try:
+            item = reserve_cart_item(request.user, product, quantity)
+        except InsufficientStock as exc:
             return Response(
-                {"detail": f"Only {product.stock} {product.unit} available"},
+                {"detail": f"Only {exc.available} {product.unit} available"},
                 status=400,
             )
 
-        item.quantity = quantity
-        item.save()
         serializer = CartItemSerializer(item)
         return Response(serializer.data, status=200)
 
@@ -449,6 +755,7 @@ class CartItemUpdateDeleteView(APIView):
 class CheckoutView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     @transaction.atomic
     def post(self, request):
         if request.user.role != "consumer":
@@ -456,98 +763,139 @@ class CheckoutView(APIView):
                 {"detail": "Only consumers can checkout"}, status=403
             )
 
-        cart_items = (
-            CartItem.objects.filter(consumer=request.user)
-            .select_related("product", "product__supplier")
-        )
+        # one checkout per consumer at a time: a second submit waits here and
+        # then finds the cart already emptied. Cart writes take the same lock,
+        # and the locked lines cannot change before they are deleted below.
+        lock_consumer(request.user.id)
+        cart_items = list(CartItem.objects.select_for_update().filter(consumer=request.user).order_by("id"))
 
-        if not cart_items.exists():
+        if not cart_items:
             return Response({"detail": "Cart is empty"}, status=400)
 
-        supplier_ids = cart_items.values_list(
-            "product__supplier_id", flat=True
-        ).distinct()
-        if supplier_ids.count() > 1:
+        quantities = {}
+        for item in cart_items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+
+        try:
+            products = decrement_stock(quantities, request.user.id)
+        except InsufficientStock as exc:
+            product = exc.product
+            if product is None:
+                return Response({"detail": "Insufficient stock, please try again"}, status=400)
             return Response(
                 {
-                    "detail": "Cart must contain items from one supplier only"
+                    "detail": f"Insufficient stock for {product.name}. Only {exc.available} {product.unit} available."
                 },
                 status=400,
             )
 
-        supplier_id = supplier_ids.first()
-
-        total_price = 0
-        for item in cart_items:
-            product = item.product
-            item_price = product.discounted_price if hasattr(product, 'discounted_price') else product.price
-            total_price += item_price * item.quantity
-
+        # one order per supplier; prices come from the locked rows, so they
+        # match the stock we took
+        items_by_supplier = {}
         for item in cart_items:
-            if item.product.stock < item.quantity:
-                return Response(
-                    {
-                        "detail": f"Insufficient stock for {item.product.name}. Only {item.product.stock} {item.product.unit} available."
-                    },
-                    status=400,
+            supplier_id = products[item.product_id].supplier_id
+            items_by_supplier.setdefault(supplier_id, []).append(item)
+
+        orders = Order.objects.bulk_create(
+            [
+                Order(
+                    consumer=request.user,
+                    supplier_id=supplier_id,
+                    total_price=sum(
+                        products[item.product_id].effective_price * item.quantity
+                        for item in items
+                    ),
+                    status="pending",
                 )
+                for supplier_id, items in items_by_supplier.items()
+            ]
+        )
 
-        order = Order.objects.create(
-            consumer=request.user,
-            supplier_id=supplier_id,
-            total_price=total_price,
-            status="pending",
+        OrderItem.objects.bulk_create(
+            [
+                OrderItem(
+                    order=order,
+                    product=products[item.product_id],
+                    quantity=item.quantity,
+                    price=products[item.product_id].effective_price,
+                )
+                for order, items in zip(orders, items_by_supplier.values())
+                for item in items
+            ]
         )
 
-        order_items = [
-            OrderItem(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.discounted_price if hasattr(item.product, 'discounted_price') else item.product.price,
-            )
-            for item in cart_items
-        ]
-        OrderItem.objects.bulk_create(order_items)
+        CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
 
-        for item in cart_items:
-            product = item.product
-            product.stock -= item.quantity
-            product.save()
+        orders = (
+            Order.objects.filter(id__in=[order.id for order in orders])
+            .select_related("consumer", "supplier")
+            .prefetch_related("items__product")
+            .order_by("id")
+        )
+        data = OrderSerializer(orders, many=True).data
+        # the first order stays at the top level for clients that expect a
+        # single order back
+        return Response({**data[0], "orders": data}, status=201)
 
-        cart_items.delete()
 
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=201)
+def order_list(queryset, params):
+    # OrderItemSerializer only needs the product's name
+    items = OrderItem.objects.select_related("product").only(
+        "id", "order_id", "product_id", "quantity", "price", "product__name"
+    )
+    return (
+        apply_order_filters(queryset, params)
+        .select_related("consumer", "supplier")
+        .prefetch_related(Prefetch("items", queryset=items))
+        .order_by("-created_at", "-id")
+    )
 
 
 class MyOrdersView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
+    pagination_class = OrderPagination
 
     def get_queryset(self):
         if self.request.user.role != "consumer":
             return Order.objects.none()
-        return (
-            Order.objects.filter(consumer=self.request.user)
-            .prefetch_related("items__product")
-            .order_by("-created_at")
+        return order_list(
+            Order.objects.filter(consumer=self.request.user), self.request.query_params
         )
 
 
 class SupplierOrdersView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = OrderSerializer
+    pagination_class = OrderPagination
 
     def get_queryset(self):
         user = self.request.user
         if not is_supplier_side(user):
             return Order.objects.none()
         company_owner = get_company_owner(user)
-        return (
-            Order.objects.filter(supplier=company_owner)
-            .prefetch_related("items__product")
-            .order_by("-created_at")
+        return order_list(
+            Order.objects.filter(supplier=company_owner), self.request.query_params
+        )
+
+
+class SupplierOrderExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if not is_supplier_side(request.user):
+            return Response(
+                {"detail": "Only supplier staff can export orders"}, status=403
+            )
+        file_format = request.GET.get("file_format", "csv")
+        if file_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": "file_format must be csv or ndjson"}, status=400
+            )
+
+        company_owner = get_company_owner(request.user)
+        return streaming_export(
+            export_orders(company_owner, file_format), file_format, "orders"
         )
 
 
@@ -578,11 +926,7 @@ class ChatHistoryView(APIView):
         else:
             return Response({"detail": "Access denied"}, status=403)
 
-        linked = LinkRequest.objects.filter(
-            consumer=consumer, supplier=supplier, status="linked"
-        ).exists()
-
-        if not linked:
+        if not is_linked(consumer.id, supplier.id, request):
             return Response({"detail": "Not linked"}, status=403)
 
         room = get_or_create_room(consumer, supplier)
@@ -595,6 +939,7 @@ class ChatHistoryView(APIView):
 class SendMessageView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, supplier_id):
         user = request.user
 
@@ -630,10 +975,7 @@ class SendMessageView(APIView):
                 status=403,
             )
 
-        linked = LinkRequest.objects.filter(
-            consumer=consumer, supplier=supplier, status="linked"
-        ).exists()
-        if not linked:
+        if not is_linked(consumer.id, supplier.id, request):
             return Response(
                 {"detail": "No active link between users"}, status=403
             )
@@ -708,16 +1050,12 @@ class SupplierRejectOrderView(APIView):
         company_owner = get_company_owner(request.user)
         order = get_object_or_404(Order, id=order_id, supplier=company_owner)
 
-        if order.status != "pending":
+        # the conditional update makes sure two rejections cannot both restock
+        cancelled = Order.objects.filter(id=order.id, status="pending").update(status="cancelled")
+        if not cancelled:
             return Response({"detail": "Order already processed"}, status=400)
 
-        for order_item in order.items.all():
-            product = order_item.product
-            product.stock += order_item.quantity
-            product.save()
-
-        order.status = "cancelled"
-        order.save()
+        restock_orders([order.id])
 
         return Response({"detail": "Order rejected"}, status=200)
 
@@ -903,25 +1241,7 @@ class ConsumerOrderStatsView(APIView):
             )
 
         orders = Order.objects.filter(consumer=request.user)
-
-        completed = orders.filter(status="delivered").count()
-        in_progress = orders.filter(status__in=["pending", "approved"]).count()
-        cancelled = orders.filter(status="cancelled").count()
-        total_spent = (
-                orders.filter(status="delivered").aggregate(total=Sum("total_price"))[
-                    "total"
-                ]
-                or 0
-        )
-
-        return Response(
-            {
-                "completed_orders": completed,
-                "in_progress_orders": in_progress,
-                "cancelled_orders": cancelled,
-                "total_spent": total_spent,
-            }
-        )
+        return Response(order_stats(orders, request.query_params, consumer_metrics()))
 
 
 class SupplierOrderStatsView(APIView):
@@ -933,28 +1253,8 @@ class SupplierOrderStatsView(APIView):
                 {"detail": "Only supplier staff can view stats"}, status=403
             )
 
-        orders = Order.objects.filter(supplier=request.user)
-        active_orders = orders.filter(
-            status__in=["pending", "approved"]
-        ).count()
-        completed_orders = orders.filter(status="delivered").count()
-        pending_deliveries = orders.filter(status="approved").count()
-
-        total_revenue = (
-                orders.filter(status="delivered").aggregate(total=Sum("total_price"))[
-                    "total"
-                ]
-                or 0
-        )
-
-        return Response(
-            {
-                "active_orders": active_orders,
-                "completed_orders": completed_orders,
-                "pending_deliveries": pending_deliveries,
-                "total_revenue": total_revenue,
-            }
-        )
+        orders = Order.objects.filter(supplier=get_company_owner(request.user))
+        return Response(order_stats(orders, request.query_params, supplier_metrics()))
 
 
 class GlobalSearchView(APIView):
@@ -965,32 +1265,51 @@ class GlobalSearchView(APIView):
 
         if not query:
             return Response(
-                {"suppliers": [], "categories": [], "products": []}
+                {
+                    "suppliers": [],
+                    "categories": [],
+                    "products": [],
+                    "products_total": 0,
+                    "fuzzy": False,
+                }
             )
 
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+            page_size = int(request.GET.get("page_size", settings.SEARCH_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return Response({"detail": "page and page_size must be numbers"}, status=400)
+        page_size = min(max(page_size, 1), settings.SEARCH_MAX_PAGE_SIZE)
+        offset = (page - 1) * page_size
+        limit = max(min(page_size, settings.SEARCH_MAX_RESULTS - offset), 0)
+
         # search only among suppliers that current consumer is linked with
-        linked_suppliers = LinkRequest.objects.filter(
-            consumer=request.user, status="linked"
-        ).values_list("supplier_id", flat=True)
+        linked_suppliers = list(get_linked_supplier_ids(request.user.id, request))
 
-        suppliers = User.objects.filter(
-            id__in=linked_suppliers, full_name__icontains=query
+        suppliers = list(
+            User.objects.filter(
+                id__in=linked_suppliers, full_name__icontains=query
+            ).select_related("company")[:page_size]
         )
+        if not suppliers:
+            suppliers = fuzzy_search_suppliers(query, linked_suppliers, page_size)
         suppliers_data = SupplierSerializer(suppliers, many=True).data
 
         categories = (
             Product.objects.filter(
                 supplier_id__in=linked_suppliers, category__icontains=query
             )
+            .order_by("category")
             .values_list("category", flat=True)
-            .distinct()
+            .distinct()[:page_size]
         )
 
-        products = Product.objects.filter(
-            supplier_id__in=linked_suppliers
-        ).filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
+        products, total = search_products(query, linked_suppliers, limit, offset)
+        # nothing matched exactly: fall back to typo-tolerant matching by name
+        fuzzy = total == 0 and offset == 0
+        if fuzzy:
+            products = fuzzy_search_products(query, linked_suppliers, limit)
+            total = len(products)
         products_data = ProductSerializer(products, many=True).data
 
         return Response(
@@ -998,6 +1317,8 @@ class GlobalSearchView(APIView):
                 "suppliers": suppliers_data,
                 "categories": list(categories),
                 "products": products_data,
+                "products_total": min(total, settings.SEARCH_MAX_RESULTS),
+                "fuzzy": fuzzy,
             }
         )
 
@@ -1052,6 +1373,8 @@ class AssignEmployeeView(APIView):
 
         employee.company = request.user.company
         employee.save()
+        # the employee's current tokens carry the old company claims
+        mark_membership_changed(employee.id)
 
         return Response({"detail": "Employee assigned successfully"})
 
@@ -1068,6 +1391,7 @@ class RemoveEmployeeView(APIView):
 
         employee.company = None
         employee.save()
+        mark_membership_changed(employee.id)
 
         return Response({"detail": "Employee removed from company"})
 
@@ -1084,7 +1408,9 @@ class DeleteOwnerAccountView(APIView):
         company = user.company
 
         if company:
-            User.objects.filter(company=company).update(company=None)
+            employees = User.objects.filter(company=company)
+            mark_membership_changed(*employees.values_list("id", flat=True))
+            employees.update(company=None)
 
             Product.objects.filter(supplier=user).delete()
 
@@ -1093,6 +1419,8 @@ class DeleteOwnerAccountView(APIView):
             company.delete()
 
         user.delete()
+        # tokens of a deleted user must not authenticate from their claims
+        mark_membership_changed(user.id)
 
         return Response(
             {"detail": "Owner account and business deleted successfully"},
@@ -15,6 +15,8 @@ from pathlib import Path
 from datetime import timedelta
 import os
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'main',
     'rest_framework',
     'corsheaders',
@@ -63,7 +66,7 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.auth.ClaimsJWTAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PERMISSION_CLASSES': [
@@ -71,12 +74,46 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Access tokens carry role/company claims (accounts/auth.py) so requests are
+# authenticated without loading the user; refreshing re-reads the claims.
+SIMPLE_JWT = {
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.auth.ClaimsTokenRefreshSerializer',
+}
+
+# Keyset pagination for supplier catalogs (?page_size= / ?cursor=)
+CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', '50'))
+CATALOG_MAX_PAGE_SIZE = int(os.getenv('CATALOG_MAX_PAGE_SIZE', '200'))
+# Catalog delta sync: tombstones are kept this long, older watermarks (or
+# more than CATALOG_SYNC_MAX_CHANGES changes) make the client reload the
+# full catalog. The overlap re-sends rows written by transactions that
+# committed after the previous sync started.
+CATALOG_SYNC_RETENTION_DAYS = int(os.getenv('CATALOG_SYNC_RETENTION_DAYS', '30'))
+CATALOG_SYNC_MAX_CHANGES = 1000
+CATALOG_SYNC_OVERLAP_SECONDS = 5
+# lower bounds of the catalog price facet buckets, the last one is open-ended
+CATALOG_PRICE_BUCKETS = [0, 1000, 5000, 20000, 100000]
+
+# Product search. An empty SEARCH_BACKEND picks PostgreSQL full-text search on
+# postgres and the inverted index backend on other databases.
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', '')
+SEARCH_TEXT_CONFIG = os.getenv('SEARCH_TEXT_CONFIG', 'simple')
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_MAX_RESULTS = 1000
+
+# Typo-tolerant fallback (pg_trgm word similarity / Python trigram index)
+SEARCH_FUZZY_THRESHOLD = 0.2
+SEARCH_FUZZY_MIN_LENGTH = 3
+SEARCH_FUZZY_MAX_CANDIDATES = 200
+SEARCH_FUZZY_TIMEOUT_MS = int(os.getenv('SEARCH_FUZZY_TIMEOUT_MS', '300'))
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://localhost:80",
     "http://localhost",
 ]
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key")
 
 
 ROOT_URLCONF = 'best_project.urls'
@@ -115,6 +152,67 @@ DATABASES = {
 }
 
 
+# Bulk product import (CSV / JSONL upload)
+PRODUCT_IMPORT_CHUNK_SIZE = 1000
+PRODUCT_IMPORT_MAX_ERRORS = 1000
+
+# Streaming exports: rows fetched per server-side cursor round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Caches. Local memory by default (tests / single process); set REDIS_URL to
+# share the cache between worker processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Token invalidation markers (accounts/auth.py) get their own alias so
+# catalog, link and cart entries can never evict them. They expire with the
+# access token lifetime, the high MAX_ENTRIES only guards against runaway use.
+CACHES['auth'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'auth-markers',
+    'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+    CACHES['auth'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        'KEY_PREFIX': 'auth',
+    }
+AUTH_CACHE_ALIAS = os.getenv('AUTH_CACHE_ALIAS', 'auth')
+
+CATALOG_CACHE_ALIAS = os.getenv('CATALOG_CACHE_ALIAS', 'default')
+CATALOG_CACHE_TIMEOUT = 60 * 60
+# consumer -> linked supplier ids, versioned per consumer like the catalogs
+LINK_CACHE_TIMEOUT = 60 * 60
+LINK_BULK_MAX_IDS = 500
+# Keyset pagination for link lists (?page_size= / ?cursor=)
+LINK_PAGE_SIZE = int(os.getenv('LINK_PAGE_SIZE', '50'))
+LINK_MAX_PAGE_SIZE = int(os.getenv('LINK_MAX_PAGE_SIZE', '200'))
+# Keyset pagination for order lists (?page_size= / ?cursor=)
+ORDER_PAGE_SIZE = int(os.getenv('ORDER_PAGE_SIZE', '50'))
+ORDER_MAX_PAGE_SIZE = int(os.getenv('ORDER_MAX_PAGE_SIZE', '200'))
+# Adding to the cart holds the quantity for this long; run
+# "manage.py release_expired_reservations" to clean up expired holds
+CART_RESERVATION_TTL = int(os.getenv('CART_RESERVATION_TTL', str(30 * 60)))
+RESERVATION_SWEEP_BATCH_SIZE = 1000
+CART_BATCH_MAX_OPERATIONS = 200
+CART_SUMMARY_CACHE_TIMEOUT = 60 * 60
+# Idempotency-Key header on checkout, cart add and message send: the first
+# response is replayed for IDEMPOTENCY_KEY_TTL seconds. Retries that arrive
+# while it is still running wait up to IDEMPOTENCY_WAIT_SECONDS; a request
+# running longer than IDEMPOTENCY_LOCK_TIMEOUT is treated as abandoned.
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', str(24 * 60 * 60)))
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+IDEMPOTENCY_LOCK_TIMEOUT = 5 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -156,6 +254,28 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Product image variants: longest side in pixels per variant name. Variants
+# are generated by a django-rq worker when IMAGE_VARIANT_QUEUE is set,
+# otherwise by "manage.py generate_image_variants". Only http(s) image URLs
+# on public addresses are fetched.
+IMAGE_VARIANTS = {
+    'thumb': 160,
+    'medium': 640,
+}
+IMAGE_VARIANT_FORMATS = ['webp', 'jpeg']
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_QUEUE = os.getenv('IMAGE_VARIANT_QUEUE', '')
+IMAGE_FETCH_TIMEOUT = 10
+IMAGE_MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+if IMAGE_VARIANT_QUEUE:
+    INSTALLED_APPS.append('django_rq')
+    RQ_QUEUES = {
+        IMAGE_VARIANT_QUEUE: {
+            'URL': os.getenv('RQ_REDIS_URL', os.getenv('REDIS_URL', 'redis://localhost:6379/0')),
+        },
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 